@@ -0,0 +1,276 @@
+"""Throughput of:
+- BGZF decompression and BAM parsing depending on the number of threads,
+- filtering eagerly vs lazily decoded alignments vs reading columnar batches,
+- dropping duplicates (30%) in Python vs before decoding,
+- flag/MAPQ summary skipping everything but fixed fields,
+- BGZF/BAM writing depending on the number of compression threads,
+- BAM to BAM filtering with re-encoding vs copying raw records.
+Decoding of a single 150 bp record is measured separately, per field.
+
+Usage: python -m benchmarks.bam [size in MB | path to BAM file]"""
+
+import os
+import random
+import struct
+import sys
+import tempfile
+import time
+import timeit
+from pathlib import Path
+from typing import Callable
+
+from biofiles.bam import (
+    BAMReader,
+    BAMWriter,
+    LazyAlignment,
+    _decode_alignment,
+    _decode_cigar,
+    _decode_quality,
+    _decode_seq,
+    _decode_tags,
+)
+from biofiles.bgzf import BGZFReader, BGZFWriter, MAX_BLOCK_DATA_SIZE
+from biofiles.types.alignment import BAMFilter, BAMFlag, ReferenceSequence
+
+
+def _generate_bam(path: Path, size: int) -> None:
+    rng = random.Random(0)
+    references = [(f"chr{i}", 100_000_000) for i in range(1, 11)]
+    with BGZFWriter(path) as w:
+        w.write(_encode_header(references))
+        idx = 0
+        while w.tell() >> 16 < size:
+            ref_idx, pos = divmod(idx * 10, 100_000_000)
+            w.write(
+                _encode_record(
+                    ref_idx % len(references),
+                    pos,
+                    f"READ{idx}",
+                    BAMFlag.DUPLICATE if rng.random() < 0.3 else 0,
+                    "".join(rng.choices("ACGT", k=150)),
+                    bytes(rng.choices(range(2, 41), k=150)),
+                )
+            )
+            idx += 1
+
+
+def _encode_header(references: list[tuple[str, int]]) -> bytes:
+    text = b"@HD\tVN:1.6\tSO:coordinate\n"
+    parts = [b"BAM\1", struct.pack("<I", len(text)), text]
+    parts.append(struct.pack("<I", len(references)))
+    for name, length in references:
+        name_bytes = name.encode() + b"\0"
+        parts.append(struct.pack("<I", len(name_bytes)) + name_bytes)
+        parts.append(struct.pack("<I", length))
+    return b"".join(parts)
+
+
+def _encode_record(
+    ref_idx: int, pos: int, name: str, flags: int, sequence: str, quality: bytes
+) -> bytes:
+    name_bytes = name.encode() + b"\0"
+    codes = ["=ACMGRSVTWYHKDBN".index(c) for c in sequence] + [0]
+    body = b"".join(
+        [
+            struct.pack(
+                "<iiBBHHHIiii",
+                ref_idx,
+                pos,
+                len(name_bytes),
+                60,
+                4681,
+                1,
+                flags,
+                len(sequence),
+                -1,
+                -1,
+                0,
+            ),
+            name_bytes,
+            struct.pack("<I", len(sequence) << 4),
+            bytes(codes[i] << 4 | codes[i + 1] for i in range(0, len(sequence), 2)),
+            quality,
+            b"NMC\0",
+        ]
+    )
+    return struct.pack("<I", len(body)) + body
+
+
+def _measure(
+    name: str, path: Path, iterate: Callable[[], int], unit: str = "records"
+) -> None:
+    started_at = time.perf_counter()
+    count = iterate()
+    elapsed = time.perf_counter() - started_at
+    size_mb = path.stat().st_size / 1e6
+    print(f"{name:>28}: {count} {unit}, {elapsed:.2f} s, {size_mb / elapsed:.1f} MB/s")
+
+
+def _decompress(path: Path, threads: int) -> int:
+    num_blocks = 0
+    with BGZFReader(path, threads=threads) as r:
+        while r.read(MAX_BLOCK_DATA_SIZE):
+            num_blocks += 1
+    return num_blocks
+
+
+def _count(path: Path, threads: int) -> int:
+    with BAMReader(path, threads=threads) as r:
+        return sum(1 for _ in r)
+
+
+def _count_filtered(path: Path, lazy: bool) -> int:
+    # A typical flag/MAPQ filter which never touches sequence, quality or tags.
+    with BAMReader(path, lazy=lazy) as r:
+        return sum(
+            1
+            for a in r
+            if not a.bam_flags & BAMFlag.SEGMENT_UNMAPPED and a.mapping_quality >= 30
+        )
+
+
+def _count_not_duplicates(path: Path, push_down: bool) -> int:
+    if push_down:
+        with BAMReader(path, filter_=BAMFilter(excluded_flags=BAMFlag.DUPLICATE)) as r:
+            return sum(1 for _ in r)
+    with BAMReader(path) as r:
+        return sum(1 for a in r if not a.bam_flags & BAMFlag.DUPLICATE)
+
+
+def _count_batches(path: Path) -> int:
+    with BAMReader(path) as r:
+        return sum(
+            len(batch["mapping_quality"])
+            for batch in r.iter_batches(fields=["bam_flags", "mapping_quality"])
+        )
+
+
+def _summarize(path: Path) -> int:
+    with BAMReader(path) as r:
+        return r.summarize().total_count
+
+
+def _compress(output_path: Path, data: bytes, threads: int) -> int:
+    with BGZFWriter(output_path, threads=threads) as w:
+        w.write(data)
+    return len(data) // MAX_BLOCK_DATA_SIZE + 1
+
+
+def _write(output_path: Path, path: Path, threads: int) -> int:
+    with (
+        BAMReader(path) as r,
+        BAMWriter(
+            output_path, r.reference_sequences, r.header_text, threads=threads
+        ) as w,
+    ):
+        alignments = [*r]
+        # Reading is not measured separately, but is the same for all runs.
+        for alignment in alignments:
+            w.write(alignment)
+    return len(alignments)
+
+
+def _filter(output_path: Path, path: Path, passthrough: bool) -> int:
+    num_written = 0
+    with (
+        BAMReader(path, lazy=True) as r,
+        BAMWriter(output_path, r.reference_sequences, r.header_text) as w,
+    ):
+        if passthrough:
+            for record in r.iter_records():
+                if record.mapping_quality >= 30:
+                    w.write_record(record)
+                    num_written += 1
+        else:
+            for alignment in r:
+                if alignment.mapping_quality >= 30:
+                    w.write(alignment)
+                    num_written += 1
+    return num_written
+
+
+def _measure_record(name: str, decode: Callable[[], object]) -> None:
+    number = 20_000
+    elapsed = min(timeit.repeat(decode, number=number, repeat=3))
+    print(f"{name:>28}: {elapsed / number * 1e9:.0f} ns per record")
+
+
+def _microbenchmark() -> None:
+    rng = random.Random(0)
+    record = _encode_record(
+        0,
+        100,
+        "READ1",
+        0,
+        "".join(rng.choices("ACGT", k=150)),
+        bytes(rng.choices(range(2, 41), k=150)),
+    )[4:]
+    record += b"MDZ150\0RGZgroup1\0ASC\x96XBBc\x03\0\0\0\x01\x02\x03"
+    ref_seqs = [ReferenceSequence(id="chr1", length=100_000_000)]
+    _measure_record("record, eager", lambda: _decode_alignment(record, ref_seqs))
+    _measure_record("record, lazy", lambda: LazyAlignment(record, ref_seqs))
+    _measure_record("record, CIGAR", lambda: _decode_cigar(record))
+    _measure_record("record, sequence", lambda: _decode_seq(record))
+    _measure_record("record, quality", lambda: _decode_quality(record))
+    _measure_record("record, tags", lambda: _decode_tags(record))
+
+
+def main(path: Path) -> None:
+    _microbenchmark()
+    thread_counts = sorted({1, 2, 4, 8, os.cpu_count() or 1})
+    for threads in thread_counts:
+        _measure(
+            f"BGZF, {threads} threads",
+            path,
+            lambda: _decompress(path, threads),
+            unit="blocks",
+        )
+    for threads in thread_counts:
+        _measure(f"BAM, {threads} threads", path, lambda: _count(path, threads))
+    _measure("BAM flag filter, eager", path, lambda: _count_filtered(path, False))
+    _measure("BAM flag filter, lazy", path, lambda: _count_filtered(path, True))
+    _measure("BAM batches", path, lambda: _count_batches(path))
+    _measure("BAM duplicates, Python", path, lambda: _count_not_duplicates(path, False))
+    _measure(
+        "BAM duplicates, push-down", path, lambda: _count_not_duplicates(path, True)
+    )
+    _measure("BAM summary", path, lambda: _summarize(path))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_path = Path(tmp_dir) / "output.bam"
+        with BGZFReader(path) as r:
+            data = r.read()
+        for threads in thread_counts:
+            _measure(
+                f"BGZF writing, {threads} threads",
+                path,
+                lambda: _compress(output_path, data, threads),
+                unit="blocks",
+            )
+        for threads in thread_counts:
+            _measure(
+                f"BAM writing, {threads} threads",
+                path,
+                lambda: _write(output_path, path, threads),
+            )
+        _measure(
+            "BAM filtering, re-encoding",
+            path,
+            lambda: _filter(output_path, path, passthrough=False),
+        )
+        _measure(
+            "BAM filtering, passthrough",
+            path,
+            lambda: _filter(output_path, path, passthrough=True),
+        )
+
+
+if __name__ == "__main__":
+    argument = sys.argv[1] if len(sys.argv) > 1 else "100"
+    if not argument.isdigit():
+        main(Path(argument))
+    else:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            bam_path = Path(tmp_dir) / "alignments.bam"
+            _generate_bam(bam_path, int(argument) * 1_000_000)
+            main(bam_path)
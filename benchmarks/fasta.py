@@ -0,0 +1,135 @@
+"""Throughput of FASTA/FASTQ parsing, line-by-line (text) vs block-based (binary),
+and of FASTA writing, line-by-line vs record-at-once.
+
+"Raw" measurements show the parsing engine alone, without constructing
+Sequence/SequencingRead objects, which dominates for short FASTQ reads.
+
+Usage: python -m benchmarks.fasta [size in MB]"""
+
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+from biofiles.fasta import FASTAReader, FASTAWriter
+from biofiles.fastq import FASTQReader
+from biofiles.types.sequence import Sequence
+from biofiles.utility.blocks import iter_fasta_records, iter_fastq_records
+
+
+def _generate_fasta(path: Path, size: int) -> None:
+    rng = random.Random(0)
+    with open(path, "w") as f:
+        written, idx = 0, 0
+        while written < size:
+            length = rng.randint(100, 100_000)
+            sequence = "".join(rng.choices("ACGT", k=length))
+            lines = [sequence[i : i + 60] for i in range(0, length, 60)]
+            record = f">SEQ{idx} synthetic sequence\n" + "\n".join(lines) + "\n"
+            f.write(record)
+            written += len(record)
+            idx += 1
+
+
+def _generate_fastq(path: Path, size: int) -> None:
+    rng = random.Random(0)
+    with open(path, "w") as f:
+        written, idx = 0, 0
+        while written < size:
+            sequence = "".join(rng.choices("ACGT", k=150))
+            quality = "".join(rng.choices("#,:F", k=150))
+            record = f"@READ{idx} 1:N:0:ATCACG\n{sequence}\n+\n{quality}\n"
+            f.write(record)
+            written += len(record)
+            idx += 1
+
+
+def _measure(name: str, path: Path, iterate: Callable[[], int]) -> None:
+    started_at = time.perf_counter()
+    count = iterate()
+    elapsed = time.perf_counter() - started_at
+    size_mb = path.stat().st_size / 1e6
+    print(f"{name:>28}: {count} records, {elapsed:.2f} s, {size_mb / elapsed:.1f} MB/s")
+
+
+def _count(reader) -> int:
+    with reader as r:
+        return sum(1 for _ in r)
+
+
+def _count_raw(path: Path, iter_records) -> int:
+    with open(path, "rb") as f:
+        return sum(1 for _ in iter_records(f))
+
+
+def _write_line_by_line(path: Path, sequences: list[Sequence]) -> int:
+    # FASTAWriter.write as it used to be: two write() calls per line.
+    with open(path, "w") as f:
+        for sequence in sequences:
+            f.write(f">{sequence.id} {sequence.description}\n")
+            sequence_len = len(sequence.sequence)
+            for offset in range(0, sequence_len, 80):
+                f.write(sequence.sequence[offset : min(offset + 80, sequence_len)])
+                f.write("\n")
+    return len(sequences)
+
+
+def _write_many(path: Path, sequences: list[Sequence]) -> int:
+    with FASTAWriter(path) as w:
+        w.write_many(sequences)
+    return len(sequences)
+
+
+def main(size_mb: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        fasta_path = Path(tmp_dir) / "sequences.fasta"
+        fastq_path = Path(tmp_dir) / "reads.fastq"
+        _generate_fasta(fasta_path, size_mb * 1_000_000)
+        _generate_fastq(fastq_path, size_mb * 1_000_000)
+
+        _measure(
+            "FASTA, text lines",
+            fasta_path,
+            lambda: _count(FASTAReader(open(fasta_path))),
+        )
+        _measure(
+            "FASTA, binary blocks", fasta_path, lambda: _count(FASTAReader(fasta_path))
+        )
+        _measure(
+            "FASTA, raw binary records",
+            fasta_path,
+            lambda: _count_raw(fasta_path, iter_fasta_records),
+        )
+        _measure(
+            "FASTQ, text lines",
+            fastq_path,
+            lambda: _count(FASTQReader(open(fastq_path))),
+        )
+        _measure(
+            "FASTQ, binary blocks", fastq_path, lambda: _count(FASTQReader(fastq_path))
+        )
+        _measure(
+            "FASTQ, raw binary records",
+            fastq_path,
+            lambda: _count_raw(fastq_path, iter_fastq_records),
+        )
+
+        with FASTAReader(fasta_path) as r:
+            sequences = [*r]
+        output_path = Path(tmp_dir) / "output.fasta"
+        _measure(
+            "FASTA writing, line by line",
+            fasta_path,
+            lambda: _write_line_by_line(output_path, sequences),
+        )
+        _measure(
+            "FASTA writing, write_many",
+            fasta_path,
+            lambda: _write_many(output_path, sequences),
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100)
@@ -0,0 +1,320 @@
+import struct
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from types import TracebackType
+from typing import BinaryIO, TYPE_CHECKING
+
+from biofiles.types.alignment import (
+    BAIChunk,
+    BAIIndex,
+    BAIReferenceIndex,
+    BAIReferenceStats,
+    BAMFlag,
+)
+
+if TYPE_CHECKING:
+    from biofiles.bam import BAMRecord
+
+
+__all__ = ["BAIReader", "BAIWriter", "build_bai", "query_chunks", "reg2bin", "reg2bins"]
+
+
+def reg2bin(start_c: int, end_c: int) -> int:
+    """Smallest bin fully containing the region (as in the SAM specification)."""
+    end_c -= 1
+    for shift, offset in _BIN_LEVELS[::-1]:
+        if start_c >> shift == end_c >> shift:
+            return offset + (start_c >> shift)
+    return 0
+
+
+def reg2bins(start_c: int, end_c: int) -> list[int]:
+    """All bins which may contain alignments overlapping the region."""
+    end_c -= 1
+    bins = [0]
+    for shift, offset in _BIN_LEVELS:
+        bins.extend(range(offset + (start_c >> shift), offset + (end_c >> shift) + 1))
+    return bins
+
+
+def query_chunks(
+    reference_index: BAIReferenceIndex, start_c: int, end_c: int
+) -> list[BAIChunk]:
+    """Merged chunks of the BAM file which contain all alignments
+    overlapping the region, in file order."""
+    linear_index = reference_index.linear_index
+    min_offset = 0
+    if linear_index:
+        min_offset = linear_index[
+            min(start_c >> _LINEAR_INDEX_SHIFT, len(linear_index) - 1)
+        ]
+
+    chunks = sorted(
+        (
+            chunk
+            for bin_ in reg2bins(start_c, end_c)
+            for chunk in reference_index.bins.get(bin_, ())
+            if chunk.end > min_offset
+        ),
+        key=lambda chunk: chunk.start,
+    )
+    merged: list[BAIChunk] = []
+    for chunk in chunks:
+        if merged and chunk.start <= merged[-1].end:
+            if chunk.end > merged[-1].end:
+                merged[-1] = BAIChunk(start=merged[-1].start, end=chunk.end)
+        else:
+            merged.append(chunk)
+    return merged
+
+
+class BAIReader:
+    def __init__(self, input_: BinaryIO | Path | str) -> None:
+        if isinstance(input_, Path | str):
+            input_ = open(input_, "rb")
+        self._input = input_
+
+    def read(self) -> BAIIndex:
+        data = self._input.read()
+        if data[:4] != b"BAI\1":
+            raise ValueError("not a BAI file, invalid magic bytes")
+        (num_references,) = struct.unpack_from("<i", data, 4)
+        offset = 8
+        references: list[BAIReferenceIndex] = []
+        for _ in range(num_references):
+            reference, offset = self._read_reference(data, offset)
+            references.append(reference)
+
+        unplaced_unmapped_count: int | None = None
+        if len(data) >= offset + 8:
+            (unplaced_unmapped_count,) = struct.unpack_from("<Q", data, offset)
+        return BAIIndex(
+            references=tuple(references),
+            unplaced_unmapped_count=unplaced_unmapped_count,
+        )
+
+    def _read_reference(
+        self, data: bytes, offset: int
+    ) -> tuple[BAIReferenceIndex, int]:
+        (num_bins,) = struct.unpack_from("<i", data, offset)
+        offset += 4
+        bins: dict[int, tuple[BAIChunk, ...]] = {}
+        stats: BAIReferenceStats | None = None
+        for _ in range(num_bins):
+            bin_, num_chunks = struct.unpack_from("<Ii", data, offset)
+            offset += 8
+            values = struct.unpack_from(f"<{2 * num_chunks}Q", data, offset)
+            offset += 16 * num_chunks
+            if bin_ == METADATA_BIN:
+                start, end, mapped_count, unmapped_count = values
+                stats = BAIReferenceStats(
+                    start=start,
+                    end=end,
+                    mapped_count=mapped_count,
+                    unmapped_count=unmapped_count,
+                )
+                continue
+            bins[bin_] = tuple(
+                BAIChunk(start=start, end=end)
+                for start, end in zip(values[::2], values[1::2])
+            )
+
+        (num_intervals,) = struct.unpack_from("<i", data, offset)
+        offset += 4
+        linear_index = struct.unpack_from(f"<{num_intervals}Q", data, offset)
+        offset += 8 * num_intervals
+        return (
+            BAIReferenceIndex(bins=bins, linear_index=linear_index, stats=stats),
+            offset,
+        )
+
+    def __enter__(self):
+        self._input.__enter__()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        self._input.__exit__(exc_type, exc_val, exc_tb)
+
+
+class BAIWriter:
+    def __init__(self, output: BinaryIO | Path | str) -> None:
+        if isinstance(output, Path | str):
+            output = open(output, "wb")
+        self._output = output
+
+    def write(self, index: BAIIndex) -> None:
+        parts = [b"BAI\1", struct.pack("<i", len(index.references))]
+        for reference in index.references:
+            parts.extend(self._encode_reference(reference))
+        if index.unplaced_unmapped_count is not None:
+            parts.append(struct.pack("<Q", index.unplaced_unmapped_count))
+        self._output.write(b"".join(parts))
+
+    @staticmethod
+    def _encode_reference(reference: BAIReferenceIndex) -> list[bytes]:
+        num_bins = len(reference.bins) + (reference.stats is not None)
+        parts = [struct.pack("<i", num_bins)]
+        for bin_, chunks in sorted(reference.bins.items()):
+            parts.append(struct.pack("<Ii", bin_, len(chunks)))
+            parts.extend(struct.pack("<QQ", chunk.start, chunk.end) for chunk in chunks)
+        if stats := reference.stats:
+            parts.append(
+                struct.pack(
+                    "<Ii4Q",
+                    METADATA_BIN,
+                    2,
+                    stats.start,
+                    stats.end,
+                    stats.mapped_count,
+                    stats.unmapped_count,
+                )
+            )
+        linear_index = reference.linear_index
+        parts.append(
+            struct.pack(f"<i{len(linear_index)}Q", len(linear_index), *linear_index)
+        )
+        return parts
+
+    def __enter__(self):
+        self._output.__enter__()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        self._output.__exit__(exc_type, exc_val, exc_tb)
+
+
+@dataclass
+class _ReferenceIndexDraft:
+    start: int
+    # Virtual file offset of the first alignment.
+    end: int = 0
+    mapped_count: int = 0
+    unmapped_count: int = 0
+    bins: dict[int, list[list[int]]] = field(default_factory=dict)
+    linear_index: list[int | None] = field(default_factory=list)
+
+    def add(self, record: "BAMRecord", start: int, end: int) -> None:
+        chunks = self.bins.setdefault(record.bai_index_bin, [])
+        if chunks and chunks[-1][1] == start:
+            chunks[-1][1] = end
+        else:
+            chunks.append([start, end])
+
+        if record.bam_flags & BAMFlag.SEGMENT_UNMAPPED:
+            self.unmapped_count += 1
+        else:
+            self.mapped_count += 1
+        end_c = record.end_c
+        first_window = record.start_c >> _LINEAR_INDEX_SHIFT
+        last_window = (end_c - 1) >> _LINEAR_INDEX_SHIFT
+        if len(self.linear_index) <= last_window:
+            self.linear_index.extend(
+                [None] * (last_window + 1 - len(self.linear_index))
+            )
+        for window in range(first_window, last_window + 1):
+            if self.linear_index[window] is None:
+                self.linear_index[window] = start
+        self.end = end
+
+    def finalize(self) -> BAIReferenceIndex:
+        linear_index: list[int] = []
+        previous_offset = self.start
+        for offset in self.linear_index:
+            previous_offset = offset if offset is not None else previous_offset
+            linear_index.append(previous_offset)
+        return BAIReferenceIndex(
+            bins={
+                bin_: tuple(BAIChunk(start=start, end=end) for start, end in chunks)
+                for bin_, chunks in self.bins.items()
+            },
+            linear_index=tuple(linear_index),
+            stats=BAIReferenceStats(
+                start=self.start,
+                end=self.end,
+                mapped_count=self.mapped_count,
+                unmapped_count=self.unmapped_count,
+            ),
+        )
+
+
+def build_bai(input_: BinaryIO | Path | str) -> BAIIndex:
+    """Index coordinate-sorted BAM file in one pass, like `samtools index` does."""
+    from biofiles.bam import BAMReader  # biofiles.bam depends on this module.
+
+    with BAMReader(input_) as reader:
+        num_references = len(reader.reference_sequences)
+        drafts: list[_ReferenceIndexDraft | None] = [None] * num_references
+        unplaced_unmapped_count = 0
+        previous_key = (-1, -1)
+        records = reader.iter_records()
+        while True:
+            start = reader.tell()
+            record = next(records, None)
+            if record is None:
+                break
+            end = reader.tell()
+
+            if record.reference_idx < 0:
+                unplaced_unmapped_count += 1
+                previous_key = (num_references, 0)
+                continue
+            key = (record.reference_idx, record.start_c)
+            if key < previous_key:
+                raise ValueError(
+                    f"BAM file is not sorted by coordinate, alignment "
+                    f"{record.read_name!r} at {record.reference_idx}:{record.start_c} "
+                    f"follows {previous_key[0]}:{previous_key[1]}"
+                )
+            previous_key = key
+            draft = drafts[record.reference_idx]
+            if draft is None:
+                draft = drafts[record.reference_idx] = _ReferenceIndexDraft(start=start)
+            draft.add(record, start, end)
+
+    return BAIIndex(
+        references=tuple(
+            (
+                draft.finalize()
+                if draft
+                else BAIReferenceIndex(bins={}, linear_index=(), stats=None)
+            )
+            for draft in drafts
+        ),
+        unplaced_unmapped_count=unplaced_unmapped_count,
+    )
+
+
+METADATA_BIN = 37450
+_LINEAR_INDEX_SHIFT = 14
+_BIN_LEVELS = ((26, 1), (23, 9), (20, 73), (17, 585), (14, 4681))
+# (shift, first bin) for levels from 512 Mbp bins to 16 kbp bins.
+
+
+if __name__ == "__main__":
+    for path in sys.argv[1:]:
+        if path.endswith(".bam"):
+            with BAIWriter(f"{path}.bai") as writer:
+                writer.write(build_bai(path))
+            path = f"{path}.bai"
+        with BAIReader(path) as reader:
+            index = reader.read()
+        print(f"{path}: {len(index.references)} references")
+        for i, reference in enumerate(index.references):
+            stats = reference.stats
+            counts = (
+                f"{stats.mapped_count} mapped, {stats.unmapped_count} unmapped"
+                if stats
+                else "no stats"
+            )
+            print(f"    #{i}: {len(reference.bins)} bins, {counts}")
@@ -1,33 +1,84 @@
-import gzip
+import operator
+import os
 import struct
 import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, fields
+from functools import cached_property, lru_cache, reduce
 from io import BytesIO
 from pathlib import Path
 from types import TracebackType
-from typing import Iterator, Any
+from typing import Iterator, Any, BinaryIO, Callable, Iterable, TypeVar
 
+from biofiles.bai import BAIReader, query_chunks, reg2bin
+from biofiles.bgzf import BGZFReader, BGZFWriter
 from biofiles.types.alignment import (
+    BAMFilter,
+    BAIIndex,
+    BAIReferenceIndex,
+    BAMFlag,
+    BAMSummary,
+    ReferenceAlignmentCounts,
     ReferenceSequence,
     Alignment,
     BAMTag,
     CIGAR,
     CIGAROpKind,
     CIGAROperation,
+    REFERENCE_CONSUMING_OPS,
 )
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+__all__ = [
+    "BATCH_FIELDS",
+    "BAMReader",
+    "BAMRecord",
+    "BAMWriter",
+    "LazyAlignment",
+    "process_references",
+]
+
+T = TypeVar("T")
+
 
 class BAMReader:
-    def __init__(self, input_: BytesIO | Path | str) -> None:
+    def __init__(
+        self,
+        input_: BytesIO | Path | str,
+        index: BinaryIO | Path | str | None = None,
+        threads: int = 1,
+        lazy: bool = False,
+        filter_: BAMFilter | None = None,
+    ) -> None:
+        if index is None and isinstance(input_, Path | str):
+            index = _find_index_path(input_)
+        self._index_input = index
+        self._index: BAIIndex | None = None
+        self._lazy = lazy
+
         if isinstance(input_, Path | str):
             input_ = open(input_, "rb")
         self._input = input_
-        self._ungzipped_input = gzip.open(input_)
+        self._ungzipped_input = BGZFReader(input_, threads=threads)
 
-        self._header_text: str | None = None
+        self._header_text = b""
         self._ref_seqs: list[ReferenceSequence] = []
 
         self._read_header()
 
+        self._filter = filter_
+        self._filter_ref_seq_idxs: frozenset[int] | None = None
+        if filter_ is not None and filter_.reference_ids is not None:
+            self._filter_ref_seq_idxs = frozenset(
+                map(self._get_ref_seq_idx, filter_.reference_ids)
+            )
+
     def _read_header(self) -> None:
         magic_bytes = self._ungzipped_input.read(8)
         magic_data = struct.unpack("<ccccI", magic_bytes)
@@ -47,124 +98,299 @@ class BAMReader:
             )
             self._ref_seqs.append(ref_seq)
 
+    @property
+    def header_text(self) -> str:
+        return self._header_text.rstrip(b"\0").decode("utf-8")
+
+    @property
+    def reference_sequences(self) -> list[ReferenceSequence]:
+        return [*self._ref_seqs]
+
     def __iter__(self) -> Iterator[Alignment]:
         return self
 
-    def __next__(self) -> Alignment:
+    def tell(self) -> int:
+        """Virtual file offset of the next alignment."""
+        return self._ungzipped_input.tell()
+
+    def seek(self, virtual_offset: int) -> None:
+        """Resume iteration at the alignment at given virtual file offset."""
+        self._ungzipped_input.seek(virtual_offset)
+
+    def fetch(self, reference_id: str, start_c: int, end_c: int) -> Iterator[Alignment]:
+        """Iterate over alignments overlapping the region (0-based, end exclusive)
+        using the .bai index. Changes current position of the reader."""
+        for record in self.fetch_records(reference_id, start_c, end_c):
+            yield self._decode_record(record.data)
+
+    def fetch_records(
+        self, reference_id: str, start_c: int, end_c: int
+    ) -> Iterator["BAMRecord"]:
+        """Same as fetch, but yields raw records, see iter_records."""
+        reference_idx = self._get_ref_seq_idx(reference_id)
+        index = self._get_index()
+        for chunk in query_chunks(index.references[reference_idx], start_c, end_c):
+            self.seek(chunk.start)
+            while self.tell() < chunk.end:
+                # Filtered reading could skip past the end of the chunk,
+                # so the filter is applied here instead.
+                data = self._read_unfiltered_record()
+                if data is None:
+                    return
+                record = BAMRecord(*_FIXED_FIELDS.unpack_from(data), data)
+                if record.reference_idx != reference_idx:
+                    break
+                if record.start_c >= end_c:
+                    return
+                if record.end_c > start_c and not self._is_rejected(
+                    record.reference_idx, record.mapping_quality, record.bam_flags
+                ):
+                    yield record
+
+    def _get_ref_seq_idx(self, reference_id: str) -> int:
+        for idx, ref_seq in enumerate(self._ref_seqs):
+            if ref_seq.id == reference_id:
+                return idx
+        raise KeyError(f"unknown reference sequence {reference_id!r}")
+
+    @property
+    def index(self) -> BAIIndex:
+        """BAI index, read on first access; ValueError if there is none."""
+        return self._get_index()
+
+    def _get_index(self) -> BAIIndex:
+        if self._index is None:
+            if self._index_input is None:
+                raise ValueError("BAM index not found, can't fetch regions")
+            with BAIReader(self._index_input) as reader:
+                self._index = reader.read()
+            if len(self._index.references) != len(self._ref_seqs):
+                raise ValueError(
+                    f"BAM index describes {len(self._index.references)} reference "
+                    f"sequences, expected {len(self._ref_seqs)}"
+                )
+        return self._index
+
+    def iter_batches(
+        self, batch_size: int = 65536, fields: Iterable[str] | None = None
+    ) -> Iterator[dict[str, Any]]:
+        """Iterate over fixed fields of alignments (see BATCH_FIELDS) in batches
+        of columns, which are NumPy arrays if NumPy is installed
+        and array.array otherwise."""
+        fields = BATCH_FIELDS if fields is None else tuple(fields)
+        if unknown_fields := [f for f in fields if f not in BATCH_FIELDS]:
+            raise ValueError(
+                f"unknown batch fields {unknown_fields!r}, "
+                f"expected some of {BATCH_FIELDS!r}"
+            )
+        while fixed_fields := self._read_fixed_fields(batch_size):
+            yield _make_batch(fixed_fields, fields)
+
+    def iter_records(self) -> Iterator["BAMRecord"]:
+        """Iterate over raw records with only fixed fields decoded,
+        they can be written as is by BAMWriter.write_record."""
+        while (data := self._read_record()) is not None:
+            yield BAMRecord(*_FIXED_FIELDS.unpack_from(data), data)
+
+    def summarize(self) -> BAMSummary:
+        """Flag statistics, mapping quality histogram and per reference counts
+        of alignments from the current position to the end of file. Only block
+        length and fixed fields of each record are read, the rest is skipped
+        without copying. Filter is not applied."""
+        input_ = self._ungzipped_input
+        key_counts: dict[tuple[int, int, bool], int] = {}
+        # (reference index, flags, whether mate is on another reference) -> count.
+        mapping_quality_counts = [0] * 256
+        prefix_size = _BLOCK_LENGTH.size + _FIXED_FIELDS.size
+        while prefix := input_.read(prefix_size):
+            if len(prefix) < prefix_size:
+                raise ValueError("invalid BAM file, truncated alignment record")
+            block_length, ref_seq_idx, mapping_quality, flags, next_ref_seq_idx = (
+                _SUMMARY_FIELDS.unpack(prefix)
+            )
+            key = (ref_seq_idx, flags, next_ref_seq_idx != ref_seq_idx)
+            key_counts[key] = key_counts.get(key, 0) + 1
+            mapping_quality_counts[mapping_quality] += 1
+            rest_length = block_length - _FIXED_FIELDS.size
+            if input_.skip(rest_length) < rest_length:
+                raise ValueError("invalid BAM file, truncated alignment record")
+        return _make_summary(key_counts, mapping_quality_counts, self._ref_seqs)
+
+    def reference_counts(self) -> tuple[ReferenceAlignmentCounts, ...]:
+        """Mapped and unmapped alignment counts per reference sequence followed
+        by the number of unmapped alignments without one, like
+        `samtools idxstats`. Taken from metadata pseudo-bins of the index
+        if it has them for every reference sequence with alignments,
+        otherwise summarize() is used."""
+        if self._index_input is not None:
+            index = self._get_index()
+            if index.unplaced_unmapped_count is not None and all(
+                reference.stats is not None or not reference.bins
+                for reference in index.references
+            ):
+                reference_counts = [
+                    (
+                        ReferenceAlignmentCounts(
+                            reference_sequence=ref_seq,
+                            mapped_count=reference.stats.mapped_count,
+                            unmapped_count=reference.stats.unmapped_count,
+                        )
+                        if reference.stats
+                        else ReferenceAlignmentCounts(ref_seq, 0, 0)
+                    )
+                    for ref_seq, reference in zip(self._ref_seqs, index.references)
+                ]
+                reference_counts.append(
+                    ReferenceAlignmentCounts(None, 0, index.unplaced_unmapped_count)
+                )
+                return tuple(reference_counts)
+        return self.summarize().reference_counts
+
+    def _read_fixed_fields(self, num_records: int) -> bytearray:
+        """Read fixed fields of up to `num_records` records passing the filter,
+        the rest of each record is skipped without copying."""
+        input_ = self._ungzipped_input
+        filter_ = self._filter
+        fixed_fields = bytearray()
+        prefix_size = _BLOCK_LENGTH.size + _FIXED_FIELDS.size
+        num_read = 0
+        while num_read < num_records and (prefix := input_.read(prefix_size)):
+            if len(prefix) < prefix_size:
+                raise ValueError("invalid BAM file, truncated alignment record")
+            block_length, ref_seq_idx, mapping_quality, flags = _FILTERED_FIELDS.unpack(
+                prefix
+            )
+            rest_length = block_length - _FIXED_FIELDS.size
+            if rest_length < 0 or input_.skip(rest_length) < rest_length:
+                raise ValueError("invalid BAM file, truncated alignment record")
+            if filter_ is not None and self._is_rejected(
+                ref_seq_idx, mapping_quality, flags
+            ):
+                continue
+            fixed_fields += memoryview(prefix)[_BLOCK_LENGTH.size :]
+            num_read += 1
+        return fixed_fields
+
+    def _read_record(self) -> bytes | None:
+        if self._filter is not None:
+            return self._read_filtered_record()
+        return self._read_unfiltered_record()
+
+    def _read_unfiltered_record(self) -> bytes | None:
         block_size_bytes = self._ungzipped_input.read(4)
         if not block_size_bytes:
-            raise StopIteration
+            return None
 
-        (block_length,) = struct.unpack("<I", block_size_bytes)
-
-        body_format = "<iiBBHHHIiii"
-        body_bytes = self._ungzipped_input.read(struct.calcsize(body_format))
-        (
-            ref_seq_idx,
-            pos,
-            read_name_length,
-            mapping_quality,
-            bai_index_bin,
-            num_cigar_ops,
-            flags,
-            seq_length,
-            next_ref_seq_idx,
-            next_pos,
-            template_length,
-        ) = struct.unpack(body_format, body_bytes)
-        read_name_bytes = self._ungzipped_input.read(read_name_length)
-
-        cigar_format = "<" + "I" * num_cigar_ops
-        cigar_bytes = self._ungzipped_input.read(struct.calcsize(cigar_format))
-        encoded_cigar = struct.unpack(cigar_format, cigar_bytes)
-
-        seq_bytes = self._ungzipped_input.read((seq_length + 1) // 2)
-        encoded_seq = struct.unpack("<" + "B" * len(seq_bytes), seq_bytes)
-
-        quality = self._ungzipped_input.read(seq_length).decode("ascii")
-
-        remaining_length = (
-            block_length
-            - len(body_bytes)
-            - len(read_name_bytes)
-            - len(cigar_bytes)
-            - len(seq_bytes)
-            - len(quality)
-        )
+        (block_length,) = _BLOCK_LENGTH.unpack(block_size_bytes)
+        record = self._ungzipped_input.read(block_length)
+        if len(record) < max(block_length, _FIXED_FIELDS.size):
+            raise ValueError("invalid BAM file, truncated alignment record")
+        return record
 
-        tags: list[BAMTag] = []
-        while remaining_length > 0:
-            tag, used_length = self._read_tag()
-            tags.append(tag)
-            remaining_length -= used_length
-        if remaining_length < 0:
-            raise ValueError("invalid BAM file, wrong tag length")
-
-        ref_seq = self._ref_seqs[ref_seq_idx] if ref_seq_idx >= 0 else None
-        next_ref_seq = (
-            self._ref_seqs[next_ref_seq_idx] if next_ref_seq_idx >= 0 else None
-        )
-        return Alignment(
-            reference_sequence=ref_seq,
-            start_c=pos,
-            read_name=read_name_bytes.rstrip(b"\0").decode("utf-8"),
-            mapping_quality=mapping_quality,
-            bai_index_bin=bai_index_bin,
-            next_reference_sequence=next_ref_seq,
-            next_start_c=next_pos,
-            template_length=template_length,
-            cigar=self._decode_cigar(encoded_cigar),
-            read_sequence=self._decode_seq(encoded_seq),
-            quality=quality,
-            bam_flags=flags,
-            bam_tags=tuple(tags),
+    def _is_rejected(self, ref_seq_idx: int, mapping_quality: int, flags: int) -> bool:
+        filter_ = self._filter
+        if filter_ is None:
+            return False
+        ref_seq_idxs = self._filter_ref_seq_idxs
+        return bool(
+            flags & filter_.required_flags != filter_.required_flags
+            or flags & filter_.excluded_flags
+            or mapping_quality < filter_.min_mapping_quality
+            or (ref_seq_idxs is not None and ref_seq_idx not in ref_seq_idxs)
         )
 
-    def _decode_cigar(self, encoded_cigar: tuple[int, ...]) -> CIGAR:
-        return CIGAR(
-            operations=tuple(
-                CIGAROperation(kind=_BAM_CIGAR_OP_KINDS[item & 0b1111], count=item >> 4)
-                for item in encoded_cigar
+    def _read_filtered_record(self) -> bytes | None:
+        prefix_size = _BLOCK_LENGTH.size + _FIXED_FIELDS.size
+        while prefix := self._ungzipped_input.read(prefix_size):
+            if len(prefix) < prefix_size:
+                raise ValueError("invalid BAM file, truncated alignment record")
+            block_length, ref_seq_idx, mapping_quality, flags = _FILTERED_FIELDS.unpack(
+                prefix
             )
-        )
+            rest_length = block_length - _FIXED_FIELDS.size
+            if self._is_rejected(ref_seq_idx, mapping_quality, flags):
+                if self._ungzipped_input.skip(rest_length) < rest_length:
+                    raise ValueError("invalid BAM file, truncated alignment record")
+                continue
+            rest = self._ungzipped_input.read(rest_length)
+            if len(rest) < rest_length:
+                raise ValueError("invalid BAM file, truncated alignment record")
+            return prefix[_BLOCK_LENGTH.size :] + rest
+        return None
 
-    def _decode_seq(self, encoded_seq: tuple[int, ...]) -> str:
-        return "".join(
-            f"{_BAM_SEQUENCE_LETTERS[b >> 4]}{_BAM_SEQUENCE_LETTERS[b & 15]}"
-            for b in encoded_seq
-        )
+    def __next__(self) -> Alignment:
+        record = self._read_record()
+        if record is None:
+            raise StopIteration
+        return self._decode_record(record)
 
-    def _read_tag(self) -> tuple[BAMTag, int]:
-        tag = self._ungzipped_input.read(2).decode("ascii")
-        value_type = self._ungzipped_input.read(1)
-        value, value_length = self._read_tag_value(value_type)
-        return BAMTag(tag=tag, value=value), 3 + value_length
-
-    def _read_tag_value(self, value_type: bytes) -> tuple[Any, int]:
-        if value_type in (b"Z", b"H"):
-            characters: list[bytes] = []
-            last_character = b""
-            while last_character != b"\0":
-                characters.append(last_character)
-                last_character = self._ungzipped_input.read(1)
-            value = b"".join(characters).decode("utf-8")
-            return value, len(characters)
-
-        elif value_type == b"B":
-            subtype, count = struct.unpack("<cI", self._ungzipped_input.read(5))
-            format_ = "<" + _BAM_FORMAT_TO_STRUCT_FORMAT[subtype] * count
-            length = struct.calcsize(format_)
-            value = struct.unpack(format_, self._ungzipped_input.read(length))
-            return value, 5 + length
+    def _decode_record(self, record: bytes) -> Alignment:
+        if self._lazy:
+            return LazyAlignment(record, self._ref_seqs)
+        return _decode_alignment(record, self._ref_seqs)
 
-        else:
-            format_ = "<" + _BAM_FORMAT_TO_STRUCT_FORMAT[value_type]
-            length = struct.calcsize(format_)
-            (value,) = struct.unpack(format_, self._ungzipped_input.read(length))
-            return value, length
+    def __enter__(self):
+        self._ungzipped_input.__enter__()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        self._ungzipped_input.__exit__(exc_type, exc_val, exc_tb)
+
+
+class BAMWriter:
+    """Writes alignments into a BAM file. Header text and reference sequences
+    can be taken from a BAMReader (see header_text and reference_sequences)."""
+
+    def __init__(
+        self,
+        output: BinaryIO | Path | str,
+        reference_sequences: list[ReferenceSequence],
+        header_text: str = "",
+        threads: int = 1,
+        compression_level: int = 6,
+    ) -> None:
+        self._output = BGZFWriter(output, compression_level, threads=threads)
+        self._ref_seq_idxs = {
+            ref_seq.id: idx for idx, ref_seq in enumerate(reference_sequences)
+        }
+        self._write_header(header_text, reference_sequences)
+
+    def _write_header(
+        self, header_text: str, reference_sequences: list[ReferenceSequence]
+    ) -> None:
+        header_text_bytes = header_text.encode("utf-8")
+        parts = [
+            b"BAM\1",
+            struct.pack("<I", len(header_text_bytes)),
+            header_text_bytes,
+            struct.pack("<I", len(reference_sequences)),
+        ]
+        for ref_seq in reference_sequences:
+            name = ref_seq.id.encode("ascii") + b"\0"
+            parts.append(struct.pack("<I", len(name)) + name)
+            parts.append(struct.pack("<I", ref_seq.length))
+        self._output.write(b"".join(parts))
+        self._output.flush()
+
+    def write(self, alignment: Alignment) -> None:
+        self._output.write(_encode_alignment(alignment, self._ref_seq_idxs))
+
+    def write_record(self, record: "BAMRecord") -> None:
+        """Copy raw record as is, reference sequences of the writer must
+        be the same as of the reader the record comes from."""
+        self._output.write(_BLOCK_LENGTH.pack(len(record.data)) + record.data)
+
+    def tell(self) -> int:
+        """Virtual file offset of the next alignment."""
+        return self._output.tell()
 
     def __enter__(self):
-        self._input.__enter__()
+        self._output.__enter__()
         return self
 
     def __exit__(
@@ -173,9 +399,557 @@ class BAMReader:
         exc_val: BaseException | None,
         exc_tb: TracebackType | None,
     ) -> None:
-        self._input.__exit__(exc_type, exc_val, exc_tb)
+        self._output.__exit__(exc_type, exc_val, exc_tb)
 
 
+def process_references(
+    path: Path | str,
+    function: Callable[[BAMReader, list[ReferenceSequence]], T],
+    merge: Callable[[T, T], T] = operator.add,
+    processes: int | None = None,
+    num_chunks: int | None = None,
+    index: Path | str | None = None,
+) -> T:
+    """Split reference sequences of an indexed BAM file into contiguous chunks
+    holding similar amounts of data, call `function(reader, chunk)` for each
+    chunk in a process pool (every call gets its own BAMReader) and merge
+    the results in the order of chunks, so the outcome doesn't depend on
+    scheduling. Alignments without a reference sequence are not processed.
+    Without reference sequences, `function(reader, [])` is called once."""
+    processes = processes or os.cpu_count() or 1
+    index = index or _find_index_path(path)
+    with BAMReader(path, index=index) as reader:
+        reference_sequences = reader.reference_sequences
+        weights = [
+            _estimate_reference_size(reference) for reference in reader.index.references
+        ]
+        chunks = _partition_references(weights, num_chunks or processes * 4)
+        if not chunks:
+            # Nothing to split, but the result should still be of the type
+            # `function` returns, e.g. an empty list.
+            return function(reader, [])
+    with ProcessPoolExecutor(processes) as executor:
+        futures = [
+            executor.submit(
+                _process_reference_chunk,
+                path,
+                index,
+                function,
+                [reference_sequences[idx] for idx in chunk],
+            )
+            for chunk in chunks
+        ]
+        return reduce(merge, (future.result() for future in futures))
+
+
+def _process_reference_chunk(
+    path: Path | str,
+    index: Path | str,
+    function: Callable[[BAMReader, list[ReferenceSequence]], T],
+    chunk: list[ReferenceSequence],
+) -> T:
+    with BAMReader(path, index=index) as reader:
+        return function(reader, chunk)
+
+
+def _estimate_reference_size(reference: BAIReferenceIndex) -> int:
+    """Compressed size of alignments of the reference sequence in bytes."""
+    if reference.stats is not None:
+        return (reference.stats.end >> 16) - (reference.stats.start >> 16)
+    return sum(
+        (chunk.end >> 16) - (chunk.start >> 16)
+        for chunks in reference.bins.values()
+        for chunk in chunks
+    )
+
+
+def _partition_references(weights: list[int], num_chunks: int) -> list[list[int]]:
+    """Split reference indices into at most `num_chunks` contiguous chunks
+    of similar total weight."""
+    chunks: list[list[int]] = [[]]
+    remaining_weight = sum(weights)
+    chunk_weight = 0
+    for idx, weight in enumerate(weights):
+        remaining_chunks = num_chunks - len(chunks) + 1
+        if (
+            chunks[-1]
+            and remaining_chunks > 1
+            and chunk_weight + weight / 2 > remaining_weight / remaining_chunks
+        ):
+            chunks.append([])
+            remaining_weight -= chunk_weight
+            chunk_weight = 0
+        chunks[-1].append(idx)
+        chunk_weight += weight
+    return [chunk for chunk in chunks if chunk]
+
+
+def _encode_alignment(alignment: Alignment, ref_seq_idxs: dict[str, int]) -> bytes:
+    read_name = alignment.read_name.encode("utf-8") + b"\0"
+    operations = alignment.cigar.operations
+    if len(operations) > 0xFFFF:
+        raise ValueError(
+            f"can't write alignment {alignment.read_name!r} with "
+            f"{len(operations)} CIGAR operations"
+        )
+    seq_length = len(alignment.read_sequence)
+    quality = alignment.quality.encode("ascii") if alignment.quality else b""
+    if not quality:
+        quality = b"\xff" * seq_length
+    elif len(quality) != seq_length:
+        raise ValueError(
+            f"quality of alignment {alignment.read_name!r} has length "
+            f"{len(quality)}, expected {seq_length}"
+        )
+    start_c = alignment.start_c
+    end_c = alignment.end_c
+    body = b"".join(
+        [
+            _FIXED_FIELDS.pack(
+                _encode_ref_seq(alignment.reference_sequence, ref_seq_idxs),
+                start_c,
+                len(read_name),
+                alignment.mapping_quality,
+                reg2bin(start_c, end_c),
+                len(operations),
+                alignment.bam_flags,
+                seq_length,
+                _encode_ref_seq(alignment.next_reference_sequence, ref_seq_idxs),
+                alignment.next_start_c,
+                alignment.template_length,
+            ),
+            read_name,
+            struct.pack(
+                f"<{len(operations)}I",
+                *(op.count << 4 | _BAM_CIGAR_OP_CODES[op.kind] for op in operations),
+            ),
+            _encode_seq(alignment.read_sequence),
+            quality,
+            *map(_encode_tag, alignment.bam_tags),
+        ]
+    )
+    return struct.pack("<I", len(body)) + body
+
+
+def _encode_ref_seq(
+    ref_seq: ReferenceSequence | None, ref_seq_idxs: dict[str, int]
+) -> int:
+    if ref_seq is None:
+        return -1
+    try:
+        return ref_seq_idxs[ref_seq.id]
+    except KeyError as exc:
+        raise ValueError(f"unknown reference sequence {ref_seq.id!r}") from exc
+
+
+def _encode_seq(seq: str) -> bytes:
+    codes = seq.encode("ascii").translate(_BAM_SEQUENCE_CODES)
+    if b"\xff" in codes:
+        raise ValueError(f"can't encode read sequence {seq!r}")
+    if len(codes) % 2:
+        codes += b"\0"
+    # High and low nibbles don't overlap, so bytes can be merged
+    # pairwise by OR-ing them as big integers.
+    high = int.from_bytes(codes[::2].translate(_SHIFTED_BAM_SEQUENCE_CODES), "big")
+    low = int.from_bytes(codes[1::2], "big")
+    return (high | low).to_bytes(len(codes) // 2, "big")
+
+
+def _encode_tag(tag: BAMTag) -> bytes:
+    value = tag.value
+    prefix = tag.tag.encode("ascii")
+    match value:
+        case str():
+            return prefix + b"Z" + value.encode("utf-8") + b"\0"
+        case bytes() if len(value) == 1:
+            return prefix + b"A" + value
+        case float():
+            return prefix + b"f" + struct.pack("<f", value)
+        case int():
+            value_type = _integer_value_type([value])
+            return prefix + value_type + _BAM_TAG_VALUE_STRUCTS[value_type].pack(value)
+        case tuple() | list():
+            if all(isinstance(item, int) for item in value):
+                subtype = _integer_value_type(value)
+            else:
+                subtype = b"f"
+            item_format = _BAM_FORMAT_TO_STRUCT_FORMAT[subtype]
+            return b"".join(
+                [
+                    prefix,
+                    b"B",
+                    _ARRAY_TAG_HEADER.pack(subtype, len(value)),
+                    struct.pack(f"<{len(value)}{item_format}", *value),
+                ]
+            )
+    raise ValueError(f"can't encode tag {tag.tag} with value {value!r}")
+
+
+def _integer_value_type(values: list[int] | tuple[int, ...]) -> bytes:
+    min_value, max_value = min(values, default=0), max(values, default=0)
+    for value_type, (lower, upper) in _BAM_INTEGER_RANGES.items():
+        if lower <= min_value and max_value <= upper:
+            return value_type
+    raise ValueError(f"integer tag values {min_value}..{max_value} out of range")
+
+
+@dataclass(slots=True)
+class BAMRecord:
+    """Raw BAM alignment record with decoded fixed fields. Reference indices
+    point into reference sequences of the reader, -1 stands for none."""
+
+    reference_idx: int
+    start_c: int
+    read_name_length: int
+    mapping_quality: int
+    bai_index_bin: int
+    num_cigar_ops: int
+    bam_flags: int
+    read_length: int
+    next_reference_idx: int
+    next_start_c: int
+    template_length: int
+    data: bytes
+
+    @property
+    def read_name(self) -> str:
+        name_end = _FIXED_FIELDS.size + self.read_name_length - 1
+        return self.data[_FIXED_FIELDS.size : name_end].decode("utf-8")
+
+    @property
+    def end_c(self) -> int:
+        """Same as Alignment.end_c."""
+        if self.bam_flags & BAMFlag.SEGMENT_UNMAPPED:
+            return self.start_c + 1
+        encoded_cigar = struct.unpack_from(
+            f"<{self.num_cigar_ops}I",
+            self.data,
+            _FIXED_FIELDS.size + self.read_name_length,
+        )
+        reference_length = sum(
+            item >> 4
+            for item in encoded_cigar
+            if _REFERENCE_CONSUMING_CIGAR_OP_CODES >> (item & 0b1111) & 1
+        )
+        return self.start_c + (reference_length or 1)
+
+
+class LazyAlignment(Alignment):
+    """Alignment keeping the raw BAM record, CIGAR, read sequence, quality
+    and tags are decoded on first access.
+
+    Compares equal to an Alignment with the same field values,
+    dataclasses.replace() makes one with all fields decoded."""
+
+    def __init__(
+        self,
+        record: bytes | None = None,
+        ref_seqs: list[ReferenceSequence] | None = None,
+        **fields: Any,
+    ) -> None:
+        if fields:
+            # Called by dataclasses.replace() with values of all fields,
+            # they shadow the cached properties.
+            self.__dict__.update(fields)
+            return
+        self.__dict__.update(_decode_fixed_fields(record, ref_seqs))
+        self.__dict__["_record"] = record
+
+    def eager(self) -> Alignment:
+        """Plain Alignment with all fields decoded."""
+        return Alignment(**{name: getattr(self, name) for name in _ALIGNMENT_FIELDS})
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Alignment):
+            return NotImplemented
+        return all(
+            getattr(self, name) == getattr(other, name) for name in _ALIGNMENT_FIELDS
+        )
+
+    __hash__ = Alignment.__hash__
+
+    @cached_property
+    def cigar(self) -> CIGAR:
+        return _decode_cigar(self._record)
+
+    @cached_property
+    def read_sequence(self) -> str:
+        return _decode_seq(self._record)
+
+    @cached_property
+    def quality(self) -> str:
+        return _decode_quality(self._record)
+
+    @cached_property
+    def bam_tags(self) -> tuple[BAMTag, ...]:
+        return _decode_tags(self._record)
+
+
+def _decode_alignment(record: bytes, ref_seqs: list[ReferenceSequence]) -> Alignment:
+    (
+        ref_seq_idx,
+        pos,
+        read_name_length,
+        mapping_quality,
+        bai_index_bin,
+        num_cigar_ops,
+        flags,
+        seq_length,
+        next_ref_seq_idx,
+        next_pos,
+        template_length,
+    ) = _FIXED_FIELDS.unpack_from(record)
+    cigar_offset = _FIXED_FIELDS.size + read_name_length
+    seq_offset = cigar_offset + 4 * num_cigar_ops
+    quality_offset = seq_offset + (seq_length + 1) // 2
+    tags_offset = quality_offset + seq_length
+    return Alignment(
+        reference_sequence=ref_seqs[ref_seq_idx] if ref_seq_idx >= 0 else None,
+        start_c=pos,
+        read_name=record[_FIXED_FIELDS.size : cigar_offset - 1].decode("utf-8"),
+        mapping_quality=mapping_quality,
+        bai_index_bin=bai_index_bin,
+        next_reference_sequence=(
+            ref_seqs[next_ref_seq_idx] if next_ref_seq_idx >= 0 else None
+        ),
+        next_start_c=next_pos,
+        template_length=template_length,
+        cigar=_decode_cigar_at(record, cigar_offset, num_cigar_ops),
+        read_sequence=_decode_seq_at(record, seq_offset, seq_length),
+        quality=_decode_quality_at(record, quality_offset, seq_length),
+        bam_flags=flags,
+        bam_tags=_decode_tags_at(record, tags_offset),
+    )
+
+
+def _make_summary(
+    key_counts: dict[tuple[int, int, bool], int],
+    mapping_quality_counts: list[int],
+    ref_seqs: list[ReferenceSequence],
+) -> BAMSummary:
+    counts = dict.fromkeys(_SUMMARY_COUNT_FIELDS, 0)
+    mapped_counts = [0] * (len(ref_seqs) + 1)
+    unmapped_counts = [0] * (len(ref_seqs) + 1)
+    # Last items are for alignments without reference sequence (index -1).
+    for (ref_seq_idx, flags, mate_on_other_reference), count in key_counts.items():
+        is_mapped = not flags & BAMFlag.SEGMENT_UNMAPPED
+        if is_mapped:
+            mapped_counts[ref_seq_idx] += count
+        else:
+            unmapped_counts[ref_seq_idx] += count
+
+        counts["total_count"] += count
+        for field_name, flag in _SUMMARY_FLAG_FIELDS:
+            if flags & flag:
+                counts[field_name] += count
+        if is_mapped:
+            counts["mapped_count"] += count
+        if flags & (
+            BAMFlag.SECONDARY_SEGMENT | BAMFlag.SUPPLEMENTARY_ALIGNMENT
+        ) or not (flags & BAMFlag.MULTIPLE_SEGMENTS):
+            continue
+        counts["paired_count"] += count
+        if flags & BAMFlag.FIRST_SEGMENT:
+            counts["read1_count"] += count
+        if flags & BAMFlag.LAST_SEGMENT:
+            counts["read2_count"] += count
+        if not is_mapped:
+            continue
+        if flags & BAMFlag.EACH_SEGMENT_PROPERLY_ALIGNED:
+            counts["properly_paired_count"] += count
+        if flags & BAMFlag.NEXT_SEGMENT_UNMAPPED:
+            counts["singleton_count"] += count
+            continue
+        counts["mate_mapped_count"] += count
+        if mate_on_other_reference:
+            counts["mate_on_other_reference_count"] += count
+
+    return BAMSummary(
+        **counts,
+        mapping_quality_histogram=tuple(mapping_quality_counts),
+        reference_counts=tuple(
+            ReferenceAlignmentCounts(
+                reference_sequence=ref_seq,
+                mapped_count=mapped_count,
+                unmapped_count=unmapped_count,
+            )
+            for ref_seq, mapped_count, unmapped_count in zip(
+                [*ref_seqs, None], mapped_counts, unmapped_counts
+            )
+        ),
+    )
+
+
+def _make_batch(fixed_fields: bytearray, fields: tuple[str, ...]) -> dict[str, Any]:
+    if np is not None:
+        records = np.frombuffer(fixed_fields, dtype=_NUMPY_FIXED_FIELDS_DTYPE)
+        return {field: np.ascontiguousarray(records[field]) for field in fields}
+    columns = dict(zip(BATCH_FIELDS, zip(*_FIXED_FIELDS.iter_unpack(fixed_fields))))
+    return {
+        field: array(_FIXED_FIELDS_TYPECODES[field], columns[field]) for field in fields
+    }
+
+
+def _decode_fixed_fields(
+    record: bytes, ref_seqs: list[ReferenceSequence]
+) -> dict[str, Any]:
+    (
+        ref_seq_idx,
+        pos,
+        read_name_length,
+        mapping_quality,
+        bai_index_bin,
+        _,
+        flags,
+        _,
+        next_ref_seq_idx,
+        next_pos,
+        template_length,
+    ) = _FIXED_FIELDS.unpack_from(record)
+    read_name_end = _FIXED_FIELDS.size + read_name_length - 1
+    return {
+        "reference_sequence": ref_seqs[ref_seq_idx] if ref_seq_idx >= 0 else None,
+        "start_c": pos,
+        "read_name": record[_FIXED_FIELDS.size : read_name_end].decode("utf-8"),
+        "mapping_quality": mapping_quality,
+        "bai_index_bin": bai_index_bin,
+        "next_reference_sequence": (
+            ref_seqs[next_ref_seq_idx] if next_ref_seq_idx >= 0 else None
+        ),
+        "next_start_c": next_pos,
+        "template_length": template_length,
+        "bam_flags": flags,
+    }
+
+
+def _record_layout(record: bytes) -> tuple[int, int, int, int]:
+    """Offset of CIGAR, number of CIGAR operations, offset of sequence
+    and sequence length."""
+    read_name_length, num_cigar_ops, seq_length = _LAYOUT_FIELDS.unpack_from(record)
+    cigar_offset = _FIXED_FIELDS.size + read_name_length
+    seq_offset = cigar_offset + 4 * num_cigar_ops
+    return cigar_offset, num_cigar_ops, seq_offset, seq_length
+
+
+def _decode_cigar(record: bytes) -> CIGAR:
+    cigar_offset, num_cigar_ops, _, _ = _record_layout(record)
+    return _decode_cigar_at(record, cigar_offset, num_cigar_ops)
+
+
+def _decode_cigar_at(record: bytes, offset: int, num_cigar_ops: int) -> CIGAR:
+    encoded_cigar = struct.unpack_from(f"<{num_cigar_ops}I", record, offset)
+    return CIGAR(operations=tuple(map(_decode_cigar_operation, encoded_cigar)))
+
+
+@lru_cache(maxsize=4096)
+def _decode_cigar_operation(item: int) -> CIGAROperation:
+    # Operations are immutable, so the same few hundred of them are reused.
+    return CIGAROperation(kind=_BAM_CIGAR_OP_KINDS[item & 0b1111], count=item >> 4)
+
+
+def _decode_seq(record: bytes) -> str:
+    _, _, seq_offset, seq_length = _record_layout(record)
+    return _decode_seq_at(record, seq_offset, seq_length)
+
+
+def _decode_seq_at(record: bytes, offset: int, seq_length: int) -> str:
+    encoded_seq = memoryview(record)[offset : offset + (seq_length + 1) // 2]
+    seq = "".join(map(_BAM_SEQUENCE_LETTER_PAIRS.__getitem__, encoded_seq))
+    return seq[:seq_length] if seq_length % 2 else seq
+
+
+def _decode_quality(record: bytes) -> str:
+    _, _, seq_offset, seq_length = _record_layout(record)
+    return _decode_quality_at(record, seq_offset + (seq_length + 1) // 2, seq_length)
+
+
+def _decode_quality_at(record: bytes, offset: int, seq_length: int) -> str:
+    if seq_length and record[offset] == 0xFF:
+        return ""  # Quality is omitted.
+    return record[offset : offset + seq_length].decode("ascii")
+
+
+def _decode_tags(record: bytes) -> tuple[BAMTag, ...]:
+    _, _, seq_offset, seq_length = _record_layout(record)
+    return _decode_tags_at(record, seq_offset + (seq_length + 1) // 2 + seq_length)
+
+
+def _decode_tags_at(record: bytes, offset: int) -> tuple[BAMTag, ...]:
+    tags: list[BAMTag] = []
+    try:
+        while offset < len(record):
+            tag = record[offset : offset + 2].decode("ascii")
+            value_type = record[offset + 2 : offset + 3]
+            offset += 3
+            if value_type in (b"Z", b"H"):
+                value_end = record.index(b"\0", offset)
+                value = record[offset:value_end].decode("utf-8")
+                offset = value_end + 1
+            elif value_type == b"B":
+                subtype, count = _ARRAY_TAG_HEADER.unpack_from(record, offset)
+                item_format = _BAM_FORMAT_TO_STRUCT_FORMAT[subtype]
+                value = struct.unpack_from(f"<{count}{item_format}", record, offset + 5)
+                offset += 5 + count * struct.calcsize(item_format)
+            else:
+                value_struct = _BAM_TAG_VALUE_STRUCTS[value_type]
+                (value,) = value_struct.unpack_from(record, offset)
+                offset += value_struct.size
+            tags.append(BAMTag(tag=tag, value=value))
+    except (KeyError, ValueError, struct.error) as exc:
+        raise ValueError(f"invalid BAM file, wrong tag at offset {offset}") from exc
+    if offset > len(record):
+        raise ValueError("invalid BAM file, wrong tag length")
+    return tuple(tags)
+
+
+def _find_index_path(path: Path | str) -> Path | None:
+    for index_path in (Path(f"{path}.bai"), Path(path).with_suffix(".bai")):
+        if index_path.is_file():
+            return index_path
+    return None
+
+
+_ALIGNMENT_FIELDS = tuple(f.name for f in fields(Alignment))
+_FIXED_FIELDS = struct.Struct("<iiBBHHHIiii")
+BATCH_FIELDS = (
+    "reference_idx",
+    "start_c",
+    "read_name_length",
+    "mapping_quality",
+    "bai_index_bin",
+    "num_cigar_ops",
+    "bam_flags",
+    "read_length",
+    "next_reference_idx",
+    "next_start_c",
+    "template_length",
+)
+# Names of _FIXED_FIELDS, reference indices are -1 for unmapped alignments.
+_FIXED_FIELDS_TYPECODES = dict(zip(BATCH_FIELDS, _FIXED_FIELDS.format[1:]))
+if np is not None:
+    _NUMPY_FIXED_FIELDS_DTYPE = np.dtype(
+        [
+            (field, np.dtype(typecode).newbyteorder("<"))
+            for field, typecode in _FIXED_FIELDS_TYPECODES.items()
+        ]
+    )
+_BLOCK_LENGTH = struct.Struct("<I")
+_FILTERED_FIELDS = struct.Struct("<Ii5xB4xH16x")
+# Block length, reference index, mapping quality and flags.
+_SUMMARY_FIELDS = struct.Struct("<Ii5xB4xH4xi8x")
+# Same plus next reference index.
+_SUMMARY_COUNT_FIELDS = [
+    f.name for f in fields(BAMSummary) if f.name.endswith("_count")
+]
+_SUMMARY_FLAG_FIELDS = (
+    ("qc_failed_count", BAMFlag.NOT_PASSING_QUALITY_CONTROL),
+    ("secondary_count", BAMFlag.SECONDARY_SEGMENT),
+    ("supplementary_count", BAMFlag.SUPPLEMENTARY_ALIGNMENT),
+    ("duplicate_count", BAMFlag.DUPLICATE),
+)
+_LAYOUT_FIELDS = struct.Struct("<8xB3xH2xI")
+# Read name length, number of CIGAR operations and sequence length.
+_ARRAY_TAG_HEADER = struct.Struct("<cI")
 _BAM_FORMAT_TO_STRUCT_FORMAT = {
     b"A": "c",
     b"c": "b",
@@ -189,11 +963,74 @@ _BAM_FORMAT_TO_STRUCT_FORMAT = {
 
 _BAM_CIGAR_OP_KINDS: list[CIGAROpKind] = ["M", "I", "D", "N", "S", "H", "P", "=", "X"]
 _BAM_SEQUENCE_LETTERS = "=ACMGRSVTWYHKDBN"
+_BAM_CIGAR_OP_CODES = {kind: code for code, kind in enumerate(_BAM_CIGAR_OP_KINDS)}
+_REFERENCE_CONSUMING_CIGAR_OP_CODES = sum(
+    1 << _BAM_CIGAR_OP_CODES[k] for k in REFERENCE_CONSUMING_OPS
+)
+# Bit mask of CIGAR operation codes.
+_BAM_SEQUENCE_LETTER_PAIRS = [
+    first + second
+    for first in _BAM_SEQUENCE_LETTERS
+    for second in _BAM_SEQUENCE_LETTERS
+]
+# Two letters encoded by each byte, high nibble first.
+_BAM_SEQUENCE_CODES = bytes(
+    _BAM_SEQUENCE_LETTERS.find(chr(i).upper()) & 0xFF for i in range(256)
+)
+# Nibble code of each letter, 0xFF for letters which can't be encoded.
+_SHIFTED_BAM_SEQUENCE_CODES = bytes((i << 4) & 0xFF for i in range(256))
+_BAM_INTEGER_RANGES = {
+    b"C": (0, 0xFF),
+    b"c": (-0x80, 0x7F),
+    b"S": (0, 0xFFFF),
+    b"s": (-0x8000, 0x7FFF),
+    b"I": (0, 0xFFFFFFFF),
+    b"i": (-0x80000000, 0x7FFFFFFF),
+}
+# Smallest fitting types first, unsigned preferred.
+_BAM_TAG_VALUE_STRUCTS = {
+    value_type: struct.Struct(f"<{format_}")
+    for value_type, format_ in _BAM_FORMAT_TO_STRUCT_FORMAT.items()
+}
+
+
+def _print_summary(summary: BAMSummary) -> None:
+    for f in fields(BAMSummary):
+        if f.name.endswith("_count"):
+            name = f.name.removesuffix("_count").replace("_", " ")
+            print(f"{getattr(summary, f.name)}\t{name}")
+    for mapping_quality, count in enumerate(summary.mapping_quality_histogram):
+        if count:
+            print(f"{count}\tMAPQ {mapping_quality}")
+    _print_reference_counts(summary.reference_counts)
+
+
+def _print_reference_counts(
+    reference_counts: Iterable[ReferenceAlignmentCounts],
+) -> None:
+    for counts in reference_counts:
+        ref_seq = counts.reference_sequence
+        name, length = (ref_seq.id, ref_seq.length) if ref_seq else ("*", 0)
+        print(f"{name}\t{length}\t{counts.mapped_count}\t{counts.unmapped_count}")
+
 
 if __name__ == "__main__":
-    for path in sys.argv[1:]:
-        num_alignments = 0
+    mode = sys.argv[1] if sys.argv[1:] and sys.argv[1].startswith("--") else None
+    if mode not in (None, "--summary", "--idxstats"):
+        print(
+            f"Usage: {sys.argv[0]} [--summary | --idxstats] <BAM files>",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+    for path in sys.argv[2:] if mode else sys.argv[1:]:
         with BAMReader(path) as reader:
+            if mode == "--summary":
+                _print_summary(reader.summarize())
+                continue
+            if mode == "--idxstats":
+                _print_reference_counts(reader.reference_counts())
+                continue
+            num_alignments = 0
             for record in reader:
                 num_alignments += 1
         print(f"Parsed {num_alignments} alignments from {path}")
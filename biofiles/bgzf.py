@@ -0,0 +1,321 @@
+import struct
+import sys
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from types import TracebackType
+from typing import BinaryIO
+
+
+__all__ = [
+    "BGZFReader",
+    "BGZFWriter",
+    "make_virtual_offset",
+    "split_virtual_offset",
+]
+
+
+def make_virtual_offset(block_offset: int, within_block_offset: int) -> int:
+    """Virtual file offset: compressed offset of the block in the upper 48 bits,
+    offset within the uncompressed block in the lower 16 bits."""
+    return (block_offset << 16) | within_block_offset
+
+
+def split_virtual_offset(virtual_offset: int) -> tuple[int, int]:
+    return virtual_offset >> 16, virtual_offset & 0xFFFF
+
+
+class BGZFReader:
+    """Reads BGZF (blocked gzip) files block by block, supporting
+    tell() and seek() in terms of virtual file offsets.
+
+    With threads > 1, upcoming blocks are decompressed in a thread pool
+    (zlib releases the GIL) while the caller processes the current one."""
+
+    def __init__(self, input_: BinaryIO | Path | str, threads: int = 1) -> None:
+        if isinstance(input_, Path | str):
+            input_ = open(input_, "rb")
+        self._input = input_
+
+        self._block_offset = 0
+        # Compressed offset of the current block.
+        self._next_block_offset = 0
+        # Compressed offset of the next block.
+        self._buffer = b""
+        self._buffer_offset = 0
+        # Uncompressed current block and position in it.
+
+        self._executor: ThreadPoolExecutor | None = None
+        self._read_ahead: deque[tuple[Future[bytes], int]] = deque()
+        self._read_ahead_size = 0
+        self._input_offset = 0
+        # Compressed offset of the block input is positioned at.
+        if threads > 1:
+            self._executor = ThreadPoolExecutor(threads)
+            self._read_ahead_size = threads * _QUEUED_BLOCKS_PER_THREAD
+
+    def read(self, size: int = -1) -> bytes:
+        buffer_offset = self._buffer_offset
+        if 0 <= size <= len(self._buffer) - buffer_offset:
+            self._buffer_offset = buffer_offset + size
+            return self._buffer[buffer_offset : buffer_offset + size]
+
+        parts: list[bytes] = []
+        while size:
+            if self._buffer_offset >= len(self._buffer) and not self._load_block():
+                break
+            end = len(self._buffer) if size < 0 else self._buffer_offset + size
+            part = self._buffer[self._buffer_offset : end]
+            self._buffer_offset += len(part)
+            parts.append(part)
+            if size > 0:
+                size -= len(part)
+        return b"".join(parts)
+
+    def skip(self, size: int) -> int:
+        """Same as read(size), but without copying the data,
+        returns number of bytes skipped."""
+        buffer_offset = self._buffer_offset
+        if 0 <= size <= len(self._buffer) - buffer_offset:
+            self._buffer_offset = buffer_offset + size
+            return size
+
+        skipped = 0
+        while skipped < size:
+            if self._buffer_offset >= len(self._buffer) and not self._load_block():
+                break
+            step = min(size - skipped, len(self._buffer) - self._buffer_offset)
+            self._buffer_offset += step
+            skipped += step
+        return skipped
+
+    def tell(self) -> int:
+        if self._buffer_offset >= len(self._buffer):
+            return make_virtual_offset(self._next_block_offset, 0)
+        return make_virtual_offset(self._block_offset, self._buffer_offset)
+
+    def seek(self, virtual_offset: int) -> None:
+        block_offset, within_block_offset = split_virtual_offset(virtual_offset)
+        if block_offset != self._block_offset or not self._buffer:
+            if block_offset != self._next_block_offset or not self._read_ahead:
+                self._cancel_read_ahead()
+                self._input.seek(block_offset)
+                self._input_offset = block_offset
+            self._next_block_offset = block_offset
+            self._buffer = b""
+            self._load_block(skip_empty=False)
+        if within_block_offset > len(self._buffer):
+            raise ValueError(f"invalid virtual offset {virtual_offset}")
+        self._buffer_offset = within_block_offset
+
+    def _load_block(self, skip_empty: bool = True) -> bool:
+        while True:
+            block_offset = self._next_block_offset
+            data, block_size = self._read_block()
+            if block_size == 0:
+                return False
+            self._block_offset = block_offset
+            self._next_block_offset = block_offset + block_size
+            self._buffer = data
+            self._buffer_offset = 0
+            if data or not skip_empty:
+                return True
+
+    def _read_block(self) -> tuple[bytes, int]:
+        if self._executor is None:
+            block_offset = self._input_offset
+            compressed, block_size = self._read_compressed_block()
+            if block_size == 0:
+                return b"", 0
+            return _decompress_block(compressed, block_offset), block_size
+
+        while len(self._read_ahead) < self._read_ahead_size:
+            block_offset = self._input_offset
+            compressed, block_size = self._read_compressed_block()
+            if block_size == 0:
+                break
+            future = self._executor.submit(_decompress_block, compressed, block_offset)
+            self._read_ahead.append((future, block_size))
+        if not self._read_ahead:
+            return b"", 0
+        future, block_size = self._read_ahead.popleft()
+        return future.result(), block_size
+
+    def _read_compressed_block(self) -> tuple[bytes, int]:
+        """Read the block input is positioned at, return its deflated data
+        followed by CRC32 and uncompressed size, and the total block size."""
+        header = self._input.read(12)
+        if not header:
+            return b"", 0
+        if len(header) < 12 or header[:4] != b"\x1f\x8b\x08\x04":
+            raise ValueError(
+                f"invalid BGZF block at offset {self._input_offset}, wrong header"
+            )
+        (extra_length,) = struct.unpack_from("<H", header, 10)
+        extra = self._input.read(extra_length)
+        block_size = _find_block_size(extra)
+        if block_size is None:
+            raise ValueError(
+                f"invalid BGZF block at offset {self._input_offset}, "
+                f"no block size field"
+            )
+        compressed = self._input.read(block_size - 12 - extra_length)
+        self._input_offset += block_size
+        return compressed, block_size
+
+    def _cancel_read_ahead(self) -> None:
+        for future, _ in self._read_ahead:
+            future.cancel()
+        self._read_ahead.clear()
+
+    def __enter__(self):
+        self._input.__enter__()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        if self._executor is not None:
+            self._cancel_read_ahead()
+            self._executor.shutdown()
+        self._input.__exit__(exc_type, exc_val, exc_tb)
+
+
+def _decompress_block(compressed: bytes, block_offset: int) -> bytes:
+    crc, data_length = struct.unpack_from("<II", compressed, len(compressed) - 8)
+    data = zlib.decompress(compressed[:-8], -15)
+    if len(data) != data_length or zlib.crc32(data) != crc:
+        raise ValueError(f"invalid BGZF block at offset {block_offset}, corrupted data")
+    return data
+
+
+def _find_block_size(extra: bytes) -> int | None:
+    offset = 0
+    while offset + 4 <= len(extra):
+        subfield_id, subfield_length = struct.unpack_from("<2sH", extra, offset)
+        if subfield_id == b"BC" and subfield_length == 2:
+            (block_size_minus_one,) = struct.unpack_from("<H", extra, offset + 4)
+            return block_size_minus_one + 1
+        offset += 4 + subfield_length
+    return None
+
+
+class BGZFWriter:
+    """Writes BGZF (blocked gzip) files, data is split into blocks
+    of at most 65280 bytes, EOF marker is written on exit.
+
+    With threads > 1, blocks are compressed in a thread pool and written
+    in order as they are ready."""
+
+    def __init__(
+        self,
+        output: BinaryIO | Path | str,
+        compression_level: int = 6,
+        threads: int = 1,
+    ) -> None:
+        if isinstance(output, Path | str):
+            output = open(output, "wb")
+        self._output = output
+        self._compression_level = compression_level
+        self._buffer = bytearray()
+        self._block_offset = 0
+        # Compressed offset of the block being filled.
+
+        self._executor: ThreadPoolExecutor | None = None
+        self._pending: deque[Future[bytes]] = deque()
+        self._max_pending = 0
+        if threads > 1:
+            self._executor = ThreadPoolExecutor(threads)
+            self._max_pending = threads * _QUEUED_BLOCKS_PER_THREAD
+
+    def write(self, data: bytes) -> None:
+        self._buffer += data
+        while len(self._buffer) >= MAX_BLOCK_DATA_SIZE:
+            self._write_block(bytes(self._buffer[:MAX_BLOCK_DATA_SIZE]))
+            del self._buffer[:MAX_BLOCK_DATA_SIZE]
+
+    def tell(self) -> int:
+        """Virtual offset of the next byte written. With threads > 1,
+        waits for all pending blocks to be compressed."""
+        self._write_pending()
+        return make_virtual_offset(self._block_offset, len(self._buffer))
+
+    def flush(self) -> None:
+        """Finish current block, so that the next write starts a new one."""
+        if self._buffer:
+            self._write_block(bytes(self._buffer))
+            self._buffer.clear()
+
+    def _write_block(self, data: bytes) -> None:
+        if self._executor is None:
+            self._write_compressed_block(compress_block(data, self._compression_level))
+            return
+        self._pending.append(
+            self._executor.submit(compress_block, data, self._compression_level)
+        )
+        while len(self._pending) > self._max_pending or (
+            self._pending and self._pending[0].done()
+        ):
+            self._write_compressed_block(self._pending.popleft().result())
+
+    def _write_pending(self) -> None:
+        while self._pending:
+            self._write_compressed_block(self._pending.popleft().result())
+
+    def _write_compressed_block(self, block: bytes) -> None:
+        self._output.write(block)
+        self._block_offset += len(block)
+
+    def __enter__(self):
+        self._output.__enter__()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        if exc_type is None:
+            self.flush()
+            self._write_pending()
+            self._output.write(EOF_MARKER)
+        if self._executor is not None:
+            for future in self._pending:
+                future.cancel()
+            self._executor.shutdown()
+        self._output.__exit__(exc_type, exc_val, exc_tb)
+
+
+def compress_block(data: bytes, compression_level: int = 6) -> bytes:
+    compressor = zlib.compressobj(compression_level, zlib.DEFLATED, -15)
+    compressed = compressor.compress(data) + compressor.flush()
+    block_size = _BLOCK_HEADER_SIZE + len(compressed) + 8
+    return b"".join(
+        [
+            _BLOCK_HEADER_PREFIX,
+            struct.pack("<H", block_size - 1),
+            compressed,
+            struct.pack("<II", zlib.crc32(data), len(data)),
+        ]
+    )
+
+
+MAX_BLOCK_DATA_SIZE = 0xFF00
+_QUEUED_BLOCKS_PER_THREAD = 4
+EOF_MARKER = bytes.fromhex("1f8b08040000000000ff0600424302001b0003000000000000000000")
+_BLOCK_HEADER_PREFIX = b"\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff\x06\x00BC\x02\x00"
+_BLOCK_HEADER_SIZE = len(_BLOCK_HEADER_PREFIX) + 2
+
+
+if __name__ == "__main__":
+    for path in sys.argv[1:]:
+        num_bytes = 0
+        with BGZFReader(path) as reader:
+            while data := reader.read(MAX_BLOCK_DATA_SIZE):
+                num_bytes += len(data)
+        print(f"{path}: {num_bytes} uncompressed bytes")
@@ -1,10 +1,25 @@
 from pathlib import Path
 from types import TracebackType
-from typing import TypeAlias, Literal, TextIO
+from typing import Any, TypeAlias, Literal, TextIO
 
 Strand: TypeAlias = Literal["+", "-"]
 
 
+def is_binary_input(input_: Any) -> bool:
+    """Whether the stream reads bytes, judged by what it returns rather than
+    by its class (e.g. tempfile wrappers don't subclass TextIOBase)."""
+    return isinstance(input_.read(0), bytes)
+
+
+def is_binary_output(output: Any) -> bool:
+    """Whether the stream accepts bytes, probed by writing nothing."""
+    try:
+        output.write(b"")
+    except TypeError:
+        return False
+    return True
+
+
 class Reader:
     def __init__(self, input_: TextIO | Path | str) -> None:
         if isinstance(input_, Path | str):
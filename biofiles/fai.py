@@ -1,21 +1,153 @@
+import os
 import sys
-from typing import Iterator
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterator, BinaryIO, Iterable
 
-from biofiles.common import Reader
+from biofiles.common import Reader, Writer
 from biofiles.types.sequence import SequenceDescription
 
 
+__all__ = ["FAIIndex", "FAIReader", "FAIWriter", "build_fai"]
+
+
 class FAIReader(Reader):
     def __iter__(self) -> Iterator[SequenceDescription]:
         for line in self._input:
-            sequence_id, length_str, byte_offset_str, _, _ = line.rstrip("\n").split(
-                "\t"
-            )
+            (
+                sequence_id,
+                length_str,
+                byte_offset_str,
+                line_bases_str,
+                line_width_str,
+            ) = line.rstrip("\n").split("\t")
             yield SequenceDescription(
-                id=sequence_id, length=int(length_str), byte_offset=int(byte_offset_str)
+                id=sequence_id,
+                length=int(length_str),
+                byte_offset=int(byte_offset_str),
+                line_bases=int(line_bases_str),
+                line_width=int(line_width_str),
             )
 
 
+class FAIIndex:
+    """Sequence descriptions from a .fai index, accessible by sequence ID."""
+
+    def __init__(self, descriptions: Iterable[SequenceDescription]) -> None:
+        self._descriptions = {desc.id: desc for desc in descriptions}
+
+    @classmethod
+    def load(cls, path: Path | str) -> "FAIIndex":
+        """Read index from file, cached until the file is modified."""
+        stat = os.stat(path)
+        return _load_fai_index(os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+    def __getitem__(self, sequence_id: str) -> SequenceDescription:
+        try:
+            return self._descriptions[sequence_id]
+        except KeyError as exc:
+            raise KeyError(f"unknown sequence {sequence_id!r}") from exc
+
+    def __contains__(self, sequence_id: object) -> bool:
+        return sequence_id in self._descriptions
+
+    def __iter__(self) -> Iterator[SequenceDescription]:
+        return iter(self._descriptions.values())
+
+    def __len__(self) -> int:
+        return len(self._descriptions)
+
+
+@lru_cache(maxsize=64)
+def _load_fai_index(path: str, mtime_ns: int, size: int) -> FAIIndex:
+    with FAIReader(path) as reader:
+        return FAIIndex(reader)
+
+
+class FAIWriter(Writer):
+    def write(self, description: SequenceDescription) -> None:
+        self._output.write(
+            f"{description.id}\t{description.length}\t{description.byte_offset}"
+            f"\t{description.line_bases}\t{description.line_width}\n"
+        )
+
+
+@dataclass
+class _DescriptionDraft:
+    id: str
+    byte_offset: int
+    length: int = 0
+    line_bases: int = 0
+    line_width: int = 0
+    finished: bool = False
+    # Set after a short (last) line, no more sequence lines are allowed.
+
+    def add_line(self, line: bytes) -> None:
+        bases = len(line.rstrip(b"\r\n"))
+        terminator = len(line) - bases
+        if bases == 0:
+            self.finished = True
+            return
+        if self.finished:
+            raise ValueError(
+                f"different line lengths in sequence {self.id!r}, "
+                f"expected all lines except the last to have equal length"
+            )
+        if not self.line_bases:
+            self.line_bases = bases
+            self.line_width = bases + (terminator or 1)
+        elif bases > self.line_bases or (
+            terminator and terminator != self.line_width - self.line_bases
+        ):
+            raise ValueError(
+                f"different line lengths in sequence {self.id!r}, "
+                f"expected all lines except the last to have equal length"
+            )
+        if bases < self.line_bases:
+            self.finished = True
+        self.length += bases
+
+    def finalize(self) -> SequenceDescription:
+        return SequenceDescription(
+            id=self.id,
+            length=self.length,
+            byte_offset=self.byte_offset,
+            line_bases=self.line_bases,
+            line_width=self.line_width,
+        )
+
+
+def build_fai(input_: BinaryIO | Path | str) -> Iterator[SequenceDescription]:
+    """Index FASTA file in one pass, like `samtools faidx` does."""
+    if isinstance(input_, Path | str):
+        with open(input_, "rb") as f:
+            yield from build_fai(f)
+        return
+
+    offset = 0
+    draft: _DescriptionDraft | None = None
+    for line in input_:
+        offset += len(line)
+        if line.startswith(b">"):
+            if draft:
+                yield draft.finalize()
+            match line[1:].split(maxsplit=1):
+                case [id_, *_]:
+                    pass
+                case []:
+                    raise ValueError(
+                        f"unexpected line {line!r}, expected a non-empty sequence identifier"
+                    )
+            draft = _DescriptionDraft(id=id_.decode("utf-8"), byte_offset=offset)
+        elif draft:
+            draft.add_line(line)
+        elif line.strip():
+            raise ValueError(f"unexpected line {line!r}, expected >")
+    if draft:
+        yield draft.finalize()
+
+
 if __name__ == "__main__":
     for path in sys.argv[1:]:
         with FAIReader(path) as reader:
@@ -1,12 +1,27 @@
+import mmap
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, Future, wait, FIRST_COMPLETED
+from io import BytesIO
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import TextIO, Iterator
+from types import TracebackType
+from typing import TextIO, Iterator, BinaryIO, Iterable
 
-from biofiles.common import Reader, Writer
-from biofiles.types.sequence import Sequence
+from biofiles.common import Reader, Writer, is_binary_input, is_binary_output
+from biofiles.fai import FAIIndex, FAIReader, FAIWriter
+from biofiles.twobit import unpack_sequence_bytes
+from biofiles.types.sequence import Sequence, SequenceDescription, PackedSequence
+from biofiles.utility.blocks import iter_fasta_records
 
 
-__all__ = ["FASTAReader", "FASTAWriter"]
+__all__ = [
+    "FASTAReader",
+    "FASTAWriter",
+    "IndexedFASTAReader",
+    "ParallelFASTAReader",
+    "SequenceView",
+]
 
 
 @dataclass
@@ -23,24 +38,64 @@ class _SequenceDraft:
         )
 
 
+@dataclass
+class _WindowDraft:
+    id: str
+    size: int
+    step: int
+    start_c: int = 0
+    buffer: str = ""
+    # Bases starting from start_c which have already been read.
+    to_skip: int = 0
+    # Bases to skip before start_c, only non-zero when step > size.
+
+    def add(self, part: str) -> Iterator[tuple[str, int, str]]:
+        if self.to_skip:
+            skipped = min(self.to_skip, len(part))
+            part = part[skipped:]
+            self.to_skip -= skipped
+        buffer = self.buffer + part
+        offset = 0
+        # Windows are sliced at increasing offsets and the consumed prefix
+        # is dropped once, so long (e.g. unwrapped) lines aren't copied
+        # for every window.
+        while len(buffer) - offset >= self.size:
+            yield self.id, self.start_c, buffer[offset : offset + self.size]
+            self.start_c += self.step
+            offset += self.step
+        if offset > len(buffer):
+            self.to_skip = offset - len(buffer)
+        self.buffer = buffer[offset:]
+
+    def finalize(self, partial: bool) -> Iterator[tuple[str, int, str]]:
+        offset = 0
+        while partial and offset < len(self.buffer):
+            yield self.id, self.start_c, self.buffer[offset:]
+            self.start_c += self.step
+            offset += self.step
+        self.buffer = ""
+
+
 class FASTAReader(Reader):
+    """Reads FASTA files. Paths and binary streams are parsed in large blocks,
+    text streams are parsed line by line."""
+
+    def __init__(self, input_: TextIO | BinaryIO | Path | str) -> None:
+        if isinstance(input_, Path | str):
+            input_ = open(input_, "rb")
+        super().__init__(input_)
+
     def __iter__(self) -> Iterator[Sequence]:
+        if is_binary_input(self._input):
+            yield from self._iter_blocks()
+            return
         draft: _SequenceDraft | None = None
         for line in self._input:
-            line = line.rstrip("\n")
+            line = line.rstrip("\r\n")
             if line.startswith(">"):
                 if draft:
                     yield draft.finalize()
-                line = line.removeprefix(">").lstrip()
-                match line.split(maxsplit=1):
-                    case [id_, desc]:
-                        pass
-                    case [id_]:
-                        desc = ""
-                    case []:
-                        raise ValueError(
-                            f"unexpected line {line!r}, expected a non-empty sequence identifier"
-                        )
+                id_, desc = _parse_header(line)
                 draft = _SequenceDraft(id=id_, description=desc)
             elif line:
                 if not draft:
@@ -49,17 +104,402 @@ class FASTAReader(Reader):
         if draft:
             yield draft.finalize()
 
+    def _iter_blocks(self) -> Iterator[Sequence]:
+        for header, sequence in iter_fasta_records(self._input):
+            yield _make_sequence(header, sequence)
+
+    def iter_windows(
+        self, size: int, step: int | None = None, partial: bool = True
+    ) -> Iterator[tuple[str, int, str]]:
+        """Iterate over (sequence_id, window_start_c, window) without assembling
+        whole sequences. Windows start every `step` bases (by default windows
+        don't overlap); with `partial=True` windows at the end of a sequence
+        are yielded even if they are shorter than `size`."""
+        if size <= 0 or (step is not None and step <= 0):
+            raise ValueError("window size and step should be positive")
+        draft: _WindowDraft | None = None
+        for line in self._iter_text_lines():
+            line = line.rstrip("\r\n")
+            if line.startswith(">"):
+                if draft:
+                    yield from draft.finalize(partial)
+                id_, _ = _parse_header(line)
+                draft = _WindowDraft(id=id_, size=size, step=step or size)
+            elif line:
+                if not draft:
+                    raise ValueError(f"unexpected line {line!r}, expected >")
+                yield from draft.add(line)
+        if draft:
+            yield from draft.finalize(partial)
+
+    def _iter_text_lines(self) -> Iterator[str]:
+        if not is_binary_input(self._input):
+            yield from self._input
+            return
+        for line in self._input:
+            yield line.decode("utf-8")
+
+
+def _parse_header(line: str) -> tuple[str, str]:
+    line = line.removeprefix(">").lstrip()
+    match line.split(maxsplit=1):
+        case [id_, desc]:
+            return id_, desc
+        case [id_]:
+            return id_, ""
+        case _:
+            raise ValueError(
+                f"unexpected line {line!r}, expected a non-empty sequence identifier"
+            )
+
+
+def _make_sequence(header: bytes, sequence: bytes) -> Sequence:
+    id_, desc = _parse_header(header.decode("utf-8"))
+    return Sequence(id=id_, description=desc, sequence=sequence.decode("ascii"))
+
+
+class ParallelFASTAReader:
+    """Parses a FASTA file in a process pool. The file is split into byte ranges
+    of roughly `chunk_size` bytes, each aligned to the next record boundary.
+
+    Sequences are yielded in the original order unless `ordered=False`.
+    Inputs which can't be read at arbitrary offsets (pipes, in-memory streams)
+    are parsed serially with FASTAReader."""
+
+    def __init__(
+        self,
+        input_: TextIO | BinaryIO | Path | str,
+        processes: int | None = None,
+        chunk_size: int = 16 << 20,
+        ordered: bool = True,
+    ) -> None:
+        path = (
+            input_ if isinstance(input_, Path | str) else getattr(input_, "name", None)
+        )
+        self._input = input_
+        self._path: Path | str | None = None
+        self._serial_reader: FASTAReader | None = None
+        if isinstance(path, Path | str) and os.path.isfile(path):
+            self._path = path
+        else:
+            self._serial_reader = FASTAReader(input_)
+        self._processes = processes or os.cpu_count() or 1
+        self._chunk_size = chunk_size
+        self._ordered = ordered
+
+    def __iter__(self) -> Iterator[Sequence]:
+        if self._serial_reader:
+            yield from self._serial_reader
+            return
+
+        size = os.path.getsize(self._path)
+        ranges = (
+            (start, min(start + self._chunk_size, size))
+            for start in range(0, size, self._chunk_size)
+        )
+        max_pending = 2 * self._processes
+        with ProcessPoolExecutor(self._processes) as executor:
+            pending: deque[Future[list[Sequence]]] = deque()
+            for start, end in ranges:
+                if len(pending) >= max_pending:
+                    yield from self._wait(pending)
+                pending.append(
+                    executor.submit(_parse_fasta_range, self._path, start, end)
+                )
+            while pending:
+                yield from self._wait(pending)
+
+    def _wait(self, pending: deque[Future[list[Sequence]]]) -> Iterator[Sequence]:
+        if self._ordered:
+            yield from pending.popleft().result()
+            return
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            pending.remove(future)
+            yield from future.result()
+
+    def __enter__(self):
+        if self._serial_reader:
+            self._serial_reader.__enter__()
+        elif not isinstance(self._input, Path | str):
+            self._input.__enter__()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        if self._serial_reader:
+            self._serial_reader.__exit__(exc_type, exc_val, exc_tb)
+        elif not isinstance(self._input, Path | str):
+            self._input.__exit__(exc_type, exc_val, exc_tb)
+
+
+def _parse_fasta_range(path: Path | str, start: int, end: int) -> list[Sequence]:
+    with open(path, "rb") as f:
+        start = _find_record_start(f, start)
+        end = _find_record_start(f, end)
+        if start >= end:
+            return []
+        f.seek(start)
+        data = f.read(end - start)
+    return [
+        _make_sequence(header, sequence)
+        for header, sequence in iter_fasta_records(BytesIO(data))
+    ]
+
+
+def _find_record_start(f: BinaryIO, offset: int) -> int:
+    """Find offset of the first record starting at or after given offset."""
+    if offset == 0:
+        return 0
+    f.seek(offset - 1)
+    position = offset - 1
+    # File offset of data[0].
+    data = b""
+    while block := f.read(1 << 16):
+        data += block
+        if (found := data.find(b"\n>")) >= 0:
+            return position + found + 1
+        position += len(data) - 1
+        data = data[-1:]
+    return position + len(data)
+
+
+class SequenceView:
+    """Lazy sequence backed by an indexed FASTA file, fetches bases only when sliced."""
+
+    def __init__(
+        self, reader: "IndexedFASTAReader", description: SequenceDescription
+    ) -> None:
+        self._reader = reader
+        self._description = description
+
+    @property
+    def id(self) -> str:
+        return self._description.id
+
+    @property
+    def description(self) -> str:
+        return self._reader._read_header_description(self._description)
+
+    def __len__(self) -> int:
+        return self._description.length
+
+    def __getitem__(self, key: int | slice) -> str:
+        if isinstance(key, slice):
+            positions = range(*key.indices(self._description.length))
+            if not positions:
+                return ""
+            # Fetch the covering range, its ends are the first and the last
+            # position, so stepping from either end selects the rest.
+            first_c, last_c = positions[0], positions[-1]
+            result = self._reader.fetch(
+                self.id, min(first_c, last_c), max(first_c, last_c) + 1
+            )
+            return result[:: positions.step] if positions.step != 1 else result
+        if key < 0:
+            key += self._description.length
+        if not 0 <= key < self._description.length:
+            raise IndexError(f"position {key} out of range")
+        return self._reader.fetch(self.id, key, key + 1)
+
+    def to_sequence(self) -> Sequence:
+        return Sequence(id=self.id, description=self.description, sequence=self[:])
+
+    def __repr__(self) -> str:
+        return f"SequenceView({self.id!r}, length={len(self)})"
+
+
+class IndexedFASTAReader:
+    """Random access to FASTA sequences by means of a .fai index.
+
+    With `memory_map=True` the file is accessed via mmap instead of seek & read,
+    so that many small fetches don't issue system calls and
+    only the pages actually touched are loaded into memory."""
+
+    def __init__(
+        self,
+        input_: BinaryIO | Path | str,
+        index: TextIO | Path | str | None = None,
+        memory_map: bool = False,
+    ) -> None:
+        if index is None:
+            if not isinstance(input_, Path | str):
+                raise ValueError("index should be specified for file objects")
+            index = f"{input_}.fai"
+        if isinstance(input_, Path | str):
+            input_ = open(input_, "rb")
+        self._input = input_
+        self._buffer: mmap.mmap | None = None
+        if memory_map:
+            self._buffer = mmap.mmap(input_.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if isinstance(index, Path | str):
+            self._index = FAIIndex.load(index)
+        else:
+            self._index = FAIIndex(FAIReader(index))
+
+    def __iter__(self) -> Iterator[SequenceView]:
+        for desc in self._index:
+            yield SequenceView(self, desc)
+
+    def __getitem__(self, sequence_id: str) -> SequenceView:
+        return SequenceView(self, self._index[sequence_id])
+
+    def fetch(self, sequence_id: str, start_c: int, end_c: int) -> str:
+        """Fetch subsequence by 0-based half-open coordinates (like Feature.start_c/end_c)."""
+        desc = self._index[sequence_id]
+        if not 0 <= start_c <= end_c <= desc.length:
+            raise ValueError(
+                f"invalid region {start_c}-{end_c} for sequence "
+                f"{sequence_id!r} of length {desc.length}"
+            )
+        if start_c == end_c:
+            return ""
+        start_byte = _base_offset(desc, start_c)
+        end_byte = _base_offset(desc, end_c - 1) + 1
+        raw = self._read(start_byte, end_byte)
+        return raw.translate(None, b"\r\n").decode("ascii")
+
+    def _read(self, start_byte: int, end_byte: int) -> bytes:
+        if self._buffer is not None:
+            return self._buffer[start_byte:end_byte]
+        self._input.seek(start_byte)
+        return self._input.read(end_byte - start_byte)
+
+    def _read_header_description(self, desc: SequenceDescription) -> str:
+        # Header line immediately precedes the first base of the sequence.
+        window = 256
+        while True:
+            start_byte = max(0, desc.byte_offset - window)
+            raw = self._read(start_byte, desc.byte_offset)
+            if (line_start := raw.rfind(b"\n", 0, len(raw) - 1)) >= 0:
+                header_line = raw[line_start + 1 :]
+                break
+            if start_byte == 0:
+                header_line = raw
+                break
+            window *= 2
+        if not header_line.startswith(b">"):
+            raise ValueError(f"can't find header of sequence {desc.id!r}")
+        header = header_line[1:].decode("utf-8").strip()
+        match header.split(maxsplit=1):
+            case [_, desc_]:
+                return desc_
+            case _:
+                return ""
+
+    def __enter__(self):
+        self._input.__enter__()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        if self._buffer is not None:
+            self._buffer.close()
+        self._input.__exit__(exc_type, exc_val, exc_tb)
+
+
+def _base_offset(desc: SequenceDescription, position_c: int) -> int:
+    line, column = divmod(position_c, desc.line_bases)
+    return desc.byte_offset + line * desc.line_width + column
+
 
 class FASTAWriter(Writer):
-    def __init__(self, output: TextIO | Path | str, width: int = 80) -> None:
+    """Writes FASTA files. Each record is formatted in memory and written
+    with a single call; paths are opened in binary mode, in which case
+    sequences given as bytes are written without decoding."""
+
+    def __init__(
+        self,
+        output: TextIO | BinaryIO | Path | str,
+        width: int = 80,
+        index: TextIO | Path | str | None = None,
+    ) -> None:
+        if isinstance(output, Path | str):
+            output = open(output, "wb")
         super().__init__(output)
+        self._binary = is_binary_output(output)
         self._width = width
+        self._index_writer = FAIWriter(index) if index is not None else None
+        self._offset = 0
+        # Number of bytes written so far, assuming the output was initially empty.
 
-    def write(self, sequence: Sequence) -> None:
-        self._output.write(f">{sequence.id} {sequence.description}\n")
-        sequence_len = len(sequence.sequence)
-        for offset in range(0, sequence_len, self._width):
-            self._output.write(
-                sequence.sequence[offset : min(offset + self._width, sequence_len)]
+    def write(self, sequence: Sequence | PackedSequence) -> None:
+        self._output.writelines(self._format(sequence))
+
+    def write_many(self, sequences: Iterable[Sequence | PackedSequence]) -> None:
+        chunk: list[str | bytes] = []
+        chunk_size = 0
+        for sequence in sequences:
+            header, body = self._format(sequence)
+            chunk += (header, body)
+            chunk_size += len(body)
+            if chunk_size >= _WRITE_CHUNK_SIZE:
+                self._output.writelines(chunk)
+                chunk.clear()
+                chunk_size = 0
+        self._output.writelines(chunk)
+
+    def _format(
+        self, sequence: Sequence | PackedSequence
+    ) -> tuple[str, str] | tuple[bytes, bytes]:
+        header = f">{sequence.id} {sequence.description}\n"
+        if isinstance(sequence, PackedSequence):
+            data = unpack_sequence_bytes(sequence)
+        else:
+            data = sequence.sequence
+
+        if self._binary:
+            header = header.encode("utf-8")
+            if isinstance(data, str):
+                data = data.encode("ascii")
+            newline = b"\n"
+        else:
+            if not isinstance(data, str):
+                data = data.decode("ascii")
+            newline = "\n"
+        width = self._width
+        lines = [data[offset : offset + width] for offset in range(0, len(data), width)]
+        lines.append(data[:0])
+        body = newline.join(lines)
+
+        if self._index_writer:
+            self._write_index(sequence.id, header, len(data))
+        return header, body
+
+    def _write_index(self, sequence_id: str, header: str | bytes, length: int) -> None:
+        if isinstance(header, str):
+            header = header.encode("utf-8")
+        self._offset += len(header)
+        line_bases = min(self._width, length)
+        self._index_writer.write(
+            SequenceDescription(
+                id=sequence_id,
+                length=length,
+                byte_offset=self._offset,
+                line_bases=line_bases,
+                line_width=line_bases + 1 if line_bases else 0,
             )
-            self._output.write("\n")
+        )
+        self._offset += length + -(-length // self._width)
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        super().__exit__(exc_type, exc_val, exc_tb)
+        if self._index_writer:
+            self._index_writer.__exit__(exc_type, exc_val, exc_tb)
+
+
+_WRITE_CHUNK_SIZE = 1 << 20
@@ -0,0 +1,77 @@
+import sys
+from pathlib import Path
+from typing import TextIO, BinaryIO, Iterator
+
+from biofiles.common import Reader, is_binary_input
+from biofiles.types.sequence import SequencingRead
+from biofiles.utility.blocks import iter_fastq_records
+
+
+__all__ = ["FASTQReader"]
+
+
+class FASTQReader(Reader):
+    """Reads four-line FASTQ files. Paths and binary streams are parsed
+    in large blocks, text streams are parsed line by line."""
+
+    def __init__(self, input_: TextIO | BinaryIO | Path | str) -> None:
+        if isinstance(input_, Path | str):
+            input_ = open(input_, "rb")
+        super().__init__(input_)
+
+    def __iter__(self) -> Iterator[SequencingRead]:
+        if is_binary_input(self._input):
+            for header, sequence, quality in iter_fastq_records(self._input):
+                id_, desc = _parse_header(header.decode("utf-8"))
+                yield SequencingRead(
+                    id=id_,
+                    description=desc,
+                    sequence=sequence.decode("ascii"),
+                    quality=quality.decode("ascii"),
+                )
+            return
+
+        lines = (line.rstrip("\r\n") for line in self._input)
+        for header in lines:
+            if not header:
+                continue
+            try:
+                sequence, separator, quality = next(lines), next(lines), next(lines)
+            except StopIteration:
+                raise ValueError(f"truncated record {header!r}") from None
+            if not header.startswith("@") or not separator.startswith("+"):
+                raise ValueError(
+                    f"unexpected record {header!r}, expected @ and + lines"
+                )
+            if len(sequence) != len(quality):
+                raise ValueError(
+                    f"unexpected record {header!r}, "
+                    f"sequence and quality have different lengths"
+                )
+            id_, desc = _parse_header(header)
+            yield SequencingRead(
+                id=id_, description=desc, sequence=sequence, quality=quality
+            )
+
+
+def _parse_header(line: str) -> tuple[str, str]:
+    match line.removeprefix("@").split(maxsplit=1):
+        case [id_, desc]:
+            return id_, desc
+        case [id_]:
+            return id_, ""
+        case _:
+            raise ValueError(
+                f"unexpected line {line!r}, expected a non-empty read identifier"
+            )
+
+
+if __name__ == "__main__":
+    for path in sys.argv[1:]:
+        num_reads = 0
+        num_bases = 0
+        with FASTQReader(path) as reader:
+            for read in reader:
+                num_reads += 1
+                num_bases += len(read.sequence)
+        print(f"Parsed {num_reads} reads ({num_bases} bases) from {path}")
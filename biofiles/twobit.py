@@ -0,0 +1,333 @@
+import re
+import struct
+import sys
+from bisect import bisect_right
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from types import TracebackType
+from typing import BinaryIO, Iterator
+
+from biofiles.types.sequence import PackedSequence, Sequence
+
+
+__all__ = [
+    "TwoBitReader",
+    "TwoBitWriter",
+    "pack_sequence",
+    "unpack_sequence",
+    "unpack_sequence_bytes",
+]
+
+
+def pack_sequence(sequence: Sequence) -> PackedSequence:
+    """Pack sequence into 2 bits per base. Bases other than A, C, G, T
+    (including IUPAC ambiguity codes) are stored as N."""
+    data = sequence.sequence.encode("ascii")
+    packed_parts: list[bytes] = []
+    for offset in range(0, len(data), _PACK_CHUNK_SIZE):
+        packed_parts.append(_pack_chunk(data[offset : offset + _PACK_CHUNK_SIZE]))
+    return PackedSequence(
+        id=sequence.id,
+        description=sequence.description,
+        length=len(data),
+        packed=b"".join(packed_parts),
+        n_blocks=tuple(m.span() for m in _N_RUN_PATTERN.finditer(data)),
+        mask_blocks=tuple(m.span() for m in _MASK_RUN_PATTERN.finditer(data)),
+    )
+
+
+def unpack_sequence(
+    sequence: PackedSequence, start_c: int = 0, end_c: int | None = None
+) -> Sequence:
+    return Sequence(
+        id=sequence.id,
+        description=sequence.description,
+        sequence=unpack_sequence_bytes(sequence, start_c, end_c).decode("ascii"),
+    )
+
+
+def unpack_sequence_bytes(
+    sequence: PackedSequence, start_c: int = 0, end_c: int | None = None
+) -> bytes:
+    if end_c is None:
+        end_c = sequence.length
+    if not 0 <= start_c <= end_c <= sequence.length:
+        raise ValueError(
+            f"invalid region {start_c}-{end_c} for sequence "
+            f"{sequence.id!r} of length {sequence.length}"
+        )
+    packed = sequence.packed[start_c // 4 : (end_c + 3) // 4]
+    return _unpack_region(
+        packed, start_c, end_c, sequence.n_blocks, sequence.mask_blocks
+    )
+
+
+def _pack_chunk(data: bytes) -> bytes:
+    # Every byte is turned into a 2-bit code, then adjacent codes are merged
+    # pairwise by shifting a single big integer, which is done in C.
+    codes = data.translate(_BASE_TO_CODE) + b"\0" * (-len(data) % 4)
+    num_bytes = len(codes)
+    mask_16, mask_32 = _pack_masks(num_bytes)
+    x = int.from_bytes(codes, "big")
+    x = (x | (x >> 6)) & mask_16
+    x = (x | (x >> 12)) & mask_32
+    return x.to_bytes(num_bytes, "big")[3::4]
+
+
+@lru_cache(maxsize=4)
+def _pack_masks(num_bytes: int) -> tuple[int, int]:
+    return (
+        int.from_bytes(b"\x00\x0f" * (num_bytes // 2), "big"),
+        int.from_bytes(b"\x00\x00\x00\xff" * (num_bytes // 4), "big"),
+    )
+
+
+def _unpack_region(
+    packed: bytes,
+    start_c: int,
+    end_c: int,
+    n_blocks: tuple[tuple[int, int], ...],
+    mask_blocks: tuple[tuple[int, int], ...],
+) -> bytes:
+    """Unpack bases start_c..end_c from `packed`, which starts with base start_c // 4."""
+    offset = start_c - start_c // 4 * 4
+    result = bytearray(b"".join(map(_CODE_QUADS.__getitem__, packed)))
+    del result[offset + end_c - start_c :]
+    del result[:offset]
+    for block_start, block_end in _overlapping_blocks(n_blocks, start_c, end_c):
+        result[block_start - start_c : block_end - start_c] = b"N" * (
+            block_end - block_start
+        )
+    for block_start, block_end in _overlapping_blocks(mask_blocks, start_c, end_c):
+        block = slice(block_start - start_c, block_end - start_c)
+        result[block] = result[block].lower()
+    return bytes(result)
+
+
+def _overlapping_blocks(
+    blocks: tuple[tuple[int, int], ...], start_c: int, end_c: int
+) -> Iterator[tuple[int, int]]:
+    idx = bisect_right(blocks, start_c, key=lambda block: block[1])
+    while idx < len(blocks) and blocks[idx][0] < end_c:
+        block_start, block_end = blocks[idx]
+        yield max(block_start, start_c), min(block_end, end_c)
+        idx += 1
+
+
+class TwoBitReader:
+    """Random access to UCSC .2bit files."""
+
+    def __init__(self, input_: BinaryIO | Path | str) -> None:
+        if isinstance(input_, Path | str):
+            input_ = open(input_, "rb")
+        self._input = input_
+        self._offsets: dict[str, int] = {}
+        self._records: dict[str, _RecordHeader] = {}
+        self._read_header()
+
+    def _read_header(self) -> None:
+        signature_bytes = self._input.read(16)
+        for byte_order in "<>":
+            signature, version, num_sequences, _ = struct.unpack(
+                f"{byte_order}IIII", signature_bytes
+            )
+            if signature == _SIGNATURE:
+                break
+        else:
+            raise ValueError("not a .2bit file, invalid signature")
+        if version not in (0, 1):
+            raise ValueError(f"unsupported .2bit version {version}")
+        self._byte_order = byte_order
+        offset_format = f"{byte_order}{'Q' if version else 'I'}"
+        offset_size = struct.calcsize(offset_format)
+
+        for _ in range(num_sequences):
+            (name_length,) = self._input.read(1)
+            name = self._input.read(name_length).decode("ascii")
+            (offset,) = struct.unpack(offset_format, self._input.read(offset_size))
+            self._offsets[name] = offset
+
+    @property
+    def sequence_ids(self) -> list[str]:
+        return [*self._offsets]
+
+    def __iter__(self) -> Iterator[PackedSequence]:
+        for sequence_id in self._offsets:
+            yield self[sequence_id]
+
+    def __getitem__(self, sequence_id: str) -> PackedSequence:
+        record = self._get_record(sequence_id)
+        self._input.seek(record.dna_offset)
+        return PackedSequence(
+            id=sequence_id,
+            description="",
+            length=record.length,
+            packed=self._input.read((record.length + 3) // 4),
+            n_blocks=record.n_blocks,
+            mask_blocks=record.mask_blocks,
+        )
+
+    def fetch(self, sequence_id: str, start_c: int, end_c: int) -> str:
+        """Fetch subsequence by 0-based half-open coordinates, reading only
+        the bytes covering the region."""
+        record = self._get_record(sequence_id)
+        if not 0 <= start_c <= end_c <= record.length:
+            raise ValueError(
+                f"invalid region {start_c}-{end_c} for sequence "
+                f"{sequence_id!r} of length {record.length}"
+            )
+        self._input.seek(record.dna_offset + start_c // 4)
+        packed = self._input.read((end_c + 3) // 4 - start_c // 4)
+        return _unpack_region(
+            packed, start_c, end_c, record.n_blocks, record.mask_blocks
+        ).decode("ascii")
+
+    def _get_record(self, sequence_id: str) -> "_RecordHeader":
+        if record := self._records.get(sequence_id):
+            return record
+        try:
+            offset = self._offsets[sequence_id]
+        except KeyError as exc:
+            raise KeyError(f"unknown sequence {sequence_id!r}") from exc
+
+        self._input.seek(offset)
+        length, n_blocks = self._read_blocks(with_length=True)
+        _, mask_blocks = self._read_blocks(with_length=False)
+        record = _RecordHeader(
+            length=length,
+            n_blocks=n_blocks,
+            mask_blocks=mask_blocks,
+            dna_offset=self._input.tell() + 4,  # Skipping reserved field.
+        )
+        self._records[sequence_id] = record
+        return record
+
+    def _read_blocks(
+        self, with_length: bool
+    ) -> tuple[int, tuple[tuple[int, int], ...]]:
+        count_format = f"{self._byte_order}{'II' if with_length else 'I'}"
+        counts = struct.unpack(
+            count_format, self._input.read(struct.calcsize(count_format))
+        )
+        num_blocks = counts[-1]
+        values_format = f"{self._byte_order}{2 * num_blocks}I"
+        values = struct.unpack(
+            values_format, self._input.read(struct.calcsize(values_format))
+        )
+        starts, sizes = values[:num_blocks], values[num_blocks:]
+        blocks = tuple((start, start + size) for start, size in zip(starts, sizes))
+        return counts[0], blocks
+
+    def __enter__(self):
+        self._input.__enter__()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        self._input.__exit__(exc_type, exc_val, exc_tb)
+
+
+class TwoBitWriter:
+    """Writes UCSC .2bit files. Since the file starts with an index of all
+    sequences, sequences are kept (packed) in memory and written on exit."""
+
+    def __init__(self, output: BinaryIO | Path | str) -> None:
+        if isinstance(output, Path | str):
+            output = open(output, "wb")
+        self._output = output
+        self._sequences: list[PackedSequence] = []
+
+    def write(self, sequence: Sequence | PackedSequence) -> None:
+        if isinstance(sequence, Sequence):
+            sequence = pack_sequence(sequence)
+        self._sequences.append(sequence)
+
+    def _flush(self) -> None:
+        records = [self._encode_record(sequence) for sequence in self._sequences]
+        names = [sequence.id.encode("ascii") for sequence in self._sequences]
+
+        version = 0
+        offset_format = "<I"
+        index_size = sum(1 + len(name) + 4 for name in names)
+        if 16 + index_size + sum(map(len, records)) > 0xFFFFFFFF:
+            version = 1
+            offset_format = "<Q"
+            index_size = sum(1 + len(name) + 8 for name in names)
+
+        self._output.write(struct.pack("<IIII", _SIGNATURE, version, len(names), 0))
+        offset = 16 + index_size
+        for name, record in zip(names, records):
+            self._output.write(bytes([len(name)]) + name)
+            self._output.write(struct.pack(offset_format, offset))
+            offset += len(record)
+        self._output.writelines(records)
+        self._sequences.clear()
+
+    @staticmethod
+    def _encode_record(sequence: PackedSequence) -> bytes:
+        return b"".join(
+            [
+                struct.pack("<II", sequence.length, len(sequence.n_blocks)),
+                _encode_blocks(sequence.n_blocks),
+                struct.pack("<I", len(sequence.mask_blocks)),
+                _encode_blocks(sequence.mask_blocks),
+                struct.pack("<I", 0),  # Reserved field.
+                sequence.packed,
+            ]
+        )
+
+    def __enter__(self):
+        self._output.__enter__()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        if exc_type is None:
+            self._flush()
+        self._output.__exit__(exc_type, exc_val, exc_tb)
+
+
+def _encode_blocks(blocks: tuple[tuple[int, int], ...]) -> bytes:
+    starts = (start for start, _ in blocks)
+    sizes = (end - start for start, end in blocks)
+    return struct.pack(f"<{2 * len(blocks)}I", *starts, *sizes)
+
+
+@dataclass(frozen=True, slots=True)
+class _RecordHeader:
+    length: int
+    n_blocks: tuple[tuple[int, int], ...]
+    mask_blocks: tuple[tuple[int, int], ...]
+    dna_offset: int
+
+
+_SIGNATURE = 0x1A412743
+_PACK_CHUNK_SIZE = 1 << 20
+_N_RUN_PATTERN = re.compile(rb"[^ACGTacgt]+")
+_MASK_RUN_PATTERN = re.compile(rb"[a-z]+")
+_BASE_CODES = {"T": 0, "C": 1, "A": 2, "G": 3}
+_BASE_TO_CODE = bytes(_BASE_CODES.get(chr(i).upper(), 0) for i in range(256))
+_CODE_QUADS = [
+    "".join("TCAG"[(b >> shift) & 3] for shift in (6, 4, 2, 0)).encode("ascii")
+    for b in range(256)
+]
+
+
+if __name__ == "__main__":
+    for path in sys.argv[1:]:
+        with TwoBitReader(path) as reader:
+            for sequence in reader:
+                print(
+                    f"{sequence.id}: {sequence.length} bases, "
+                    f"{sum(e - s for s, e in sequence.n_blocks)} N, "
+                    f"{sum(e - s for s, e in sequence.mask_blocks)} soft-masked"
+                )
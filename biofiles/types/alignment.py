@@ -3,17 +3,29 @@ from dataclasses import dataclass
 
 __all__ = [
     "Alignment",
+    "BAIChunk",
+    "BAIIndex",
+    "BAIReferenceIndex",
+    "BAIReferenceStats",
+    "BAMFilter",
     "BAMFlag",
+    "BAMSummary",
     "BAMTag",
     "CIGAR",
     "CIGAROpKind",
     "CIGAROperation",
+    "CoverageInterval",
+    "REFERENCE_CONSUMING_OPS",
+    "ReferenceAlignmentCounts",
     "ReferenceSequence",
+    "SpliceJunction",
 ]
 
 from enum import IntFlag
 
-from typing import Any, Literal
+from typing import Any, Collection, Literal
+
+from biofiles.common import Strand
 
 
 @dataclass(frozen=True)
@@ -47,6 +59,16 @@ class CIGAR:
     def __str__(self) -> str:
         return "".join(f"{op.count}{op.kind}" for op in self.operations)
 
+    @property
+    def reference_length(self) -> int:
+        """Number of reference bases covered (M, D, N, = and X operations)."""
+        return sum(
+            op.count for op in self.operations if op.kind in REFERENCE_CONSUMING_OPS
+        )
+
+
+REFERENCE_CONSUMING_OPS = frozenset("MDN=X")
+
 
 class BAMFlag(IntFlag):
     MULTIPLE_SEGMENTS = 1 << 0
@@ -63,6 +85,19 @@ class BAMFlag(IntFlag):
     SUPPLEMENTARY_ALIGNMENT = 1 << 11
 
 
+@dataclass(frozen=True)
+class BAMFilter:
+    """Alignments to keep, checked before decoding anything but fixed fields."""
+
+    required_flags: int = 0
+    # All of these flags must be set,
+    excluded_flags: int = 0
+    # and none of these.
+    min_mapping_quality: int = 0
+    reference_ids: Collection[str] | None = None
+    # None means any reference sequence (including unmapped alignments).
+
+
 @dataclass(frozen=True)
 class Alignment:
     reference_sequence: ReferenceSequence | None
@@ -82,3 +117,95 @@ class Alignment:
 
     bam_flags: int
     bam_tags: tuple[BAMTag, ...]
+
+    @property
+    def end_c(self) -> int:
+        """0-based exclusive end on the reference; unmapped alignments and
+        ones without reference-consuming operations are considered to cover
+        one base (same as htslib's bam_endpos)."""
+        if self.bam_flags & BAMFlag.SEGMENT_UNMAPPED:
+            return self.start_c + 1
+        return self.start_c + (self.cigar.reference_length or 1)
+
+
+@dataclass(frozen=True)
+class BAIChunk:
+    start: int
+    end: int
+    # Virtual file offsets, end exclusive.
+
+
+@dataclass(frozen=True)
+class BAIReferenceStats:
+    start: int
+    end: int
+    # Virtual file offsets of the first and past the last alignment.
+    mapped_count: int
+    unmapped_count: int
+
+
+@dataclass(frozen=True)
+class BAIReferenceIndex:
+    bins: dict[int, tuple[BAIChunk, ...]]
+    linear_index: tuple[int, ...]
+    # Smallest virtual file offset of alignments overlapping each 16 kbp window.
+    stats: BAIReferenceStats | None
+
+
+@dataclass(frozen=True)
+class BAIIndex:
+    references: tuple[BAIReferenceIndex, ...]
+    unplaced_unmapped_count: int | None
+
+
+@dataclass(frozen=True, slots=True)
+class CoverageInterval:
+    reference_sequence: ReferenceSequence
+    start_c: int
+    end_c: int
+    depth: float
+    # Number of alignments covering each base, or mean of it over the interval.
+
+
+@dataclass(frozen=True, slots=True)
+class SpliceJunction:
+    reference_sequence: ReferenceSequence
+    start_c: int
+    end_c: int
+    # Intron coordinates, i.e. of the N operation of the CIGAR.
+    strand: Strand | None
+    # From the XS tag set by spliced aligners, None if unknown.
+    read_count: int
+    known: bool | None
+    # Whether the intron is present in the annotation, None if not checked.
+
+
+@dataclass(frozen=True)
+class ReferenceAlignmentCounts:
+    reference_sequence: ReferenceSequence | None
+    # None for unmapped alignments without a reference sequence.
+    mapped_count: int
+    unmapped_count: int
+
+
+@dataclass(frozen=True)
+class BAMSummary:
+    total_count: int
+    qc_failed_count: int
+    secondary_count: int
+    supplementary_count: int
+    duplicate_count: int
+    mapped_count: int
+    paired_count: int
+    read1_count: int
+    read2_count: int
+    properly_paired_count: int
+    mate_mapped_count: int
+    singleton_count: int
+    mate_on_other_reference_count: int
+    # Counts starting from paired_count are of primary alignments only,
+    # as in `samtools flagstat`.
+    mapping_quality_histogram: tuple[int, ...]
+    # Number of alignments with each mapping quality from 0 to 255.
+    reference_counts: tuple[ReferenceAlignmentCounts, ...]
+    # Same as reported by `samtools idxstats`.
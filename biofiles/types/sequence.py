@@ -1,7 +1,7 @@
 from dataclasses import dataclass
 
 
-__all__ = ["Sequence"]
+__all__ = ["PackedSequence", "Sequence", "SequenceDescription", "SequencingRead"]
 
 
 @dataclass(frozen=True)
@@ -11,8 +11,33 @@ class Sequence:
     sequence: str
 
 
+@dataclass(frozen=True)
+class PackedSequence:
+    id: str
+    description: str
+    length: int
+    packed: bytes
+    # 2 bits per base (T=0, C=1, A=2, G=3 as in UCSC .2bit), first base in high bits.
+    n_blocks: tuple[tuple[int, int], ...]
+    mask_blocks: tuple[tuple[int, int], ...]
+    # Sorted 0-based half-open runs of N and of lowercase (soft-masked) bases.
+
+
+@dataclass(frozen=True)
+class SequencingRead:
+    id: str
+    description: str
+    sequence: str
+    quality: str
+    # Phred quality scores encoded as in FASTQ, i.e. chr(score + 33).
+
+
 @dataclass(frozen=True)
 class SequenceDescription:
     id: str
     length: int
     byte_offset: int
+    # Offset of the first base of the sequence in the FASTA file.
+    line_bases: int
+    line_width: int
+    # Number of bases per line and number of bytes per line (including newline).
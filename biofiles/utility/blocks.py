@@ -0,0 +1,118 @@
+"""Block-based parsing of FASTA/FASTQ records from binary streams.
+
+Instead of iterating over lines, input is read in large blocks and record
+boundaries are found with bytes.find, so per-line overhead (decoding, stripping,
+Python-level loop iterations) is avoided. Only headers are to be decoded."""
+
+from typing import BinaryIO, Iterator
+
+
+__all__ = ["iter_fasta_records", "iter_fastq_records", "DEFAULT_BLOCK_SIZE"]
+
+DEFAULT_BLOCK_SIZE = 1 << 20
+
+
+def iter_fasta_records(
+    input_: BinaryIO, block_size: int = DEFAULT_BLOCK_SIZE
+) -> Iterator[tuple[bytes, bytes]]:
+    """Yield (header, sequence) pairs, header without leading ">",
+    sequence with line breaks removed."""
+    parts: list[bytes] | None = None
+    # Parts of the current record following ">", None before the first record.
+    at_line_start = True
+    while block := input_.read(block_size):
+        start = 0
+        if at_line_start and block.startswith(b">"):
+            if parts is not None:
+                yield _finalize_fasta_record(parts)
+            parts = []
+            start = 1
+        while (boundary := block.find(b"\n>", start)) >= 0:
+            parts = _append_fasta_part(parts, block[start : boundary + 1])
+            if parts is not None:
+                yield _finalize_fasta_record(parts)
+            parts = []
+            start = boundary + 2
+        parts = _append_fasta_part(parts, block[start:])
+        at_line_start = block.endswith(b"\n")
+    if parts is not None:
+        yield _finalize_fasta_record(parts)
+
+
+def _append_fasta_part(parts: list[bytes] | None, part: bytes) -> list[bytes] | None:
+    if parts is None:
+        if part.strip():
+            raise ValueError(f"unexpected line {part.split()[0]!r}, expected >")
+        return None
+    parts.append(part)
+    return parts
+
+
+def _finalize_fasta_record(parts: list[bytes]) -> tuple[bytes, bytes]:
+    data = b"".join(parts)
+    header_end = data.find(b"\n")
+    if header_end < 0:
+        return data.rstrip(b"\r"), b""
+    return data[:header_end].rstrip(b"\r"), data[header_end + 1 :].translate(
+        None, b"\r\n"
+    )
+
+
+def iter_fastq_records(
+    input_: BinaryIO, block_size: int = DEFAULT_BLOCK_SIZE
+) -> Iterator[tuple[bytes, bytes, bytes]]:
+    """Yield (header, sequence, quality) triples, header without leading "@".
+    Only four-line records are supported, CRLF line breaks and blank lines
+    between records are allowed."""
+    leftover = b""
+    while True:
+        block = input_.read(block_size)
+        data = leftover + block
+        if b"\r" in data:
+            data = data.replace(b"\r\n", b"\n")
+            if not block:
+                data = data.removesuffix(b"\r")
+        lines = data.split(b"\n")
+        if block:
+            # Last line is incomplete, as well as the record it belongs to.
+            last_line = lines.pop()
+        else:
+            last_line = b""
+            if lines[-1] == b"":
+                lines.pop()
+        if not all(lines):
+            lines = _drop_blank_lines_between_records(lines)
+        num_complete_lines = len(lines) // 4 * 4
+        if not block and num_complete_lines < len(lines):
+            raise ValueError(f"truncated record {lines[num_complete_lines]!r}")
+        leftover = b"\n".join([*lines[num_complete_lines:], last_line])
+        del lines[num_complete_lines:]
+
+        it = iter(lines)
+        for header, sequence, separator, quality in zip(it, it, it, it):
+            if not header.startswith(b"@") or not separator.startswith(b"+"):
+                raise ValueError(
+                    f"unexpected record {header!r}, expected @ and + lines"
+                )
+            if len(sequence) != len(quality):
+                raise ValueError(
+                    f"unexpected record {header!r}, "
+                    f"sequence and quality have different lengths"
+                )
+            yield header[1:], sequence, quality
+        if not block:
+            return
+
+
+def _drop_blank_lines_between_records(lines: list[bytes]) -> list[bytes]:
+    # Blank lines within a record are empty sequence and quality, so they
+    # are only dropped where a header is expected, as the text parser does.
+    result: list[bytes] = []
+    i = 0
+    while i < len(lines):
+        if not lines[i]:
+            i += 1
+            continue
+        result.extend(lines[i : i + 4])
+        i += 4
+    return result
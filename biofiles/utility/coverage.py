@@ -0,0 +1,202 @@
+"""Streaming per-base coverage over coordinate-sorted alignments.
+
+Every alignment adds +1/-1 at the ends of its reference blocks into a sparse
+difference array (a dict of deltas plus a heap of their positions). Positions
+before the start of the current alignment can't change anymore, so they are
+flushed as bedGraph-like intervals, and memory is bounded by the span
+of overlapping alignments rather than by the reference length."""
+
+import sys
+from dataclasses import dataclass, field
+from heapq import heappop, heappush
+from itertools import groupby
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from biofiles.bam import BAMReader
+from biofiles.common import Writer
+from biofiles.types.alignment import (
+    Alignment,
+    BAMFlag,
+    CoverageInterval,
+    REFERENCE_CONSUMING_OPS,
+    ReferenceSequence,
+)
+
+
+__all__ = [
+    "BedGraphWriter",
+    "DEFAULT_EXCLUDED_FLAGS",
+    "iter_binned_coverage",
+    "iter_coverage",
+]
+
+DEFAULT_EXCLUDED_FLAGS = (
+    BAMFlag.SEGMENT_UNMAPPED
+    | BAMFlag.SECONDARY_SEGMENT
+    | BAMFlag.NOT_PASSING_QUALITY_CONTROL
+    | BAMFlag.DUPLICATE
+)
+# Same as `samtools depth` skips by default.
+
+
+def iter_coverage(
+    alignments: Iterable[Alignment],
+    count_deletions: bool = True,
+    excluded_flags: int = DEFAULT_EXCLUDED_FLAGS,
+) -> Iterator[CoverageInterval]:
+    """Intervals of constant non-zero depth, alignments must be sorted
+    by coordinate. M, = and X operations are counted, D only if
+    `count_deletions`, N never."""
+    counted_kinds = _COUNTED_KINDS | {"D"} if count_deletions else _COUNTED_KINDS
+    draft: _CoverageDraft | None = None
+    finished_reference_ids: set[str] = set()
+    for alignment in alignments:
+        if alignment.bam_flags & excluded_flags:
+            continue
+        reference = alignment.reference_sequence
+        if reference is None:
+            continue
+        if draft is None or draft.reference_sequence != reference:
+            if reference.id in finished_reference_ids:
+                raise ValueError(
+                    f"alignments are not sorted by coordinate, {alignment.read_name!r} "
+                    f"on {reference.id} follows alignments on other references"
+                )
+            if draft is not None:
+                yield from draft.flush()
+                finished_reference_ids.add(draft.reference_sequence.id)
+            draft = _CoverageDraft(reference_sequence=reference)
+        elif alignment.start_c < draft.last_start_c:
+            raise ValueError(
+                f"alignments are not sorted by coordinate, {alignment.read_name!r} "
+                f"at {reference.id}:{alignment.start_c} "
+                f"follows one at {reference.id}:{draft.last_start_c}"
+            )
+        yield from draft.flush(until_c=alignment.start_c)
+        draft.add(alignment, counted_kinds)
+    if draft is not None:
+        yield from draft.flush()
+
+
+def iter_binned_coverage(
+    alignments: Iterable[Alignment],
+    bin_size: int,
+    count_deletions: bool = True,
+    excluded_flags: int = DEFAULT_EXCLUDED_FLAGS,
+) -> Iterator[CoverageInterval]:
+    """Mean depth in consecutive bins covering whole reference sequences
+    (only those having alignments), alignments must be sorted by coordinate."""
+    intervals = iter_coverage(alignments, count_deletions, excluded_flags)
+    for reference, reference_intervals in groupby(
+        intervals, key=lambda interval: interval.reference_sequence
+    ):
+        bin_start_c, total_depth = 0, 0
+        for interval in reference_intervals:
+            start_c = interval.start_c
+            while start_c < interval.end_c:
+                bin_end_c = bin_start_c + bin_size
+                if start_c >= bin_end_c:
+                    yield _make_bin(reference, bin_start_c, bin_end_c, total_depth)
+                    bin_start_c, total_depth = bin_end_c, 0
+                    continue
+                overlap_end_c = min(interval.end_c, bin_end_c)
+                total_depth += (overlap_end_c - start_c) * interval.depth
+                start_c = overlap_end_c
+        while bin_start_c < reference.length:
+            bin_end_c = bin_start_c + bin_size
+            yield _make_bin(reference, bin_start_c, bin_end_c, total_depth)
+            bin_start_c, total_depth = bin_end_c, 0
+
+
+def _make_bin(
+    reference: ReferenceSequence, start_c: int, end_c: int, total_depth: int
+) -> CoverageInterval:
+    if start_c < reference.length:
+        end_c = min(end_c, reference.length)
+    return CoverageInterval(
+        reference_sequence=reference,
+        start_c=start_c,
+        end_c=end_c,
+        depth=total_depth / (end_c - start_c),
+    )
+
+
+@dataclass
+class _CoverageDraft:
+    reference_sequence: ReferenceSequence
+    deltas: dict[int, int] = field(default_factory=dict)
+    positions: list[int] = field(default_factory=list)
+    # Heap of positions present in deltas.
+    depth: int = 0
+    start_c: int = 0
+    # Start of the interval with current depth.
+    last_start_c: int = 0
+
+    def add(self, alignment: Alignment, counted_kinds: frozenset[str]) -> None:
+        self.last_start_c = position_c = alignment.start_c
+        block_start_c: int | None = None
+        for op in alignment.cigar.operations:
+            if op.kind in counted_kinds:
+                if block_start_c is None:
+                    block_start_c = position_c
+                position_c += op.count
+            elif op.kind in REFERENCE_CONSUMING_OPS:
+                if block_start_c is not None:
+                    self._add_block(block_start_c, position_c)
+                    block_start_c = None
+                position_c += op.count
+        if block_start_c is not None:
+            self._add_block(block_start_c, position_c)
+
+    def _add_block(self, start_c: int, end_c: int) -> None:
+        for position_c, delta in ((start_c, 1), (end_c, -1)):
+            if position_c in self.deltas:
+                self.deltas[position_c] += delta
+            else:
+                self.deltas[position_c] = delta
+                heappush(self.positions, position_c)
+
+    def flush(self, until_c: int | None = None) -> Iterator[CoverageInterval]:
+        """Emit intervals ending before `until_c` (all if None)."""
+        positions = self.positions
+        while positions and (until_c is None or positions[0] < until_c):
+            position_c = heappop(positions)
+            delta = self.deltas.pop(position_c)
+            if not delta:
+                continue
+            if self.depth:
+                yield CoverageInterval(
+                    reference_sequence=self.reference_sequence,
+                    start_c=self.start_c,
+                    end_c=position_c,
+                    depth=self.depth,
+                )
+            self.depth += delta
+            self.start_c = position_c
+
+
+class BedGraphWriter(Writer):
+    def write(self, interval: CoverageInterval) -> None:
+        depth = interval.depth
+        fields = (
+            interval.reference_sequence.id,
+            str(interval.start_c),
+            str(interval.end_c),
+            str(depth) if isinstance(depth, int) else f"{depth:.3f}",
+        )
+        self._output.write("\t".join(fields))
+        self._output.write("\n")
+
+
+_COUNTED_KINDS = frozenset("M=X")
+
+
+if __name__ == "__main__":
+    for path in sys.argv[1:]:
+        with (
+            BAMReader(path, lazy=True) as reader,
+            BedGraphWriter(Path(path).with_suffix(".bedGraph")) as writer,
+        ):
+            for interval in iter_coverage(reader):
+                writer.write(interval)
@@ -0,0 +1,155 @@
+"""Splice junction counting over spliced (e.g. RNA-seq) alignments.
+
+Introns are taken from N operations of the CIGAR, so read sequences, qualities
+and (unless an alignment has an N operation) tags are never needed; with a lazy
+`BAMReader` they aren't even decoded. Counts are kept in a single dict keyed
+by (reference sequence id, start, end, strand) tuples, so memory is bounded
+by the number of distinct junctions rather than by the number of reads."""
+
+import sys
+from pathlib import Path
+from typing import Collection, Iterable, Iterator, TypeAlias
+
+from biofiles.bam import BAMReader
+from biofiles.common import Strand
+from biofiles.dialects.detector import detect_dialect
+from biofiles.dialects.genomic_base import Transcript
+from biofiles.gtf import GTFReader
+from biofiles.types.alignment import (
+    Alignment,
+    REFERENCE_CONSUMING_OPS,
+    ReferenceSequence,
+    SpliceJunction,
+)
+from biofiles.types.feature import Feature
+from biofiles.utility.coverage import DEFAULT_EXCLUDED_FLAGS
+
+
+__all__ = [
+    "DEFAULT_EXCLUDED_FLAGS",
+    "JunctionCounter",
+    "JunctionKey",
+    "known_junctions",
+]
+
+JunctionKey: TypeAlias = tuple[str, int, int, Strand | None]
+# Reference sequence id, intron start_c and end_c, strand.
+
+
+class JunctionCounter:
+    """Counts alignments supporting each splice junction, alignments may
+    come in any order. Strand is taken from the XS tag."""
+
+    def __init__(self, excluded_flags: int = DEFAULT_EXCLUDED_FLAGS) -> None:
+        self._excluded_flags = excluded_flags
+        self._counts: dict[JunctionKey, int] = {}
+        self._reference_sequences: dict[str, ReferenceSequence] = {}
+
+    def add(self, alignment: Alignment) -> None:
+        if alignment.bam_flags & self._excluded_flags:
+            return
+        reference = alignment.reference_sequence
+        if reference is None:
+            return
+        strand: Strand | None = None
+        counts = self._counts
+        position_c = alignment.start_c
+        for op in alignment.cigar.operations:
+            if op.kind == "N":
+                if reference.id not in self._reference_sequences:
+                    self._reference_sequences[reference.id] = reference
+                if strand is None:
+                    strand = _strand(alignment)
+                key = (reference.id, position_c, position_c + op.count, strand)
+                counts[key] = counts.get(key, 0) + 1
+            if op.kind in REFERENCE_CONSUMING_OPS:
+                position_c += op.count
+
+    def update(self, alignments: Iterable[Alignment]) -> None:
+        for alignment in alignments:
+            self.add(alignment)
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def __getitem__(self, key: JunctionKey) -> int:
+        return self._counts.get(key, 0)
+
+    def iter_junctions(
+        self, known: Collection[JunctionKey] | None = None
+    ) -> Iterator[SpliceJunction]:
+        """Junctions sorted by reference sequence id and coordinates.
+        If `known` junctions are given (see `known_junctions`), each one
+        is annotated as known or novel; junctions and annotated introns
+        of unknown strand match both strands."""
+        for key in sorted(self._counts, key=_sort_key):
+            reference_id, start_c, end_c, strand = key
+            is_known: bool | None = None
+            if known is not None:
+                strands = (strand, None) if strand is not None else ("+", "-", None)
+                is_known = any(
+                    (reference_id, start_c, end_c, s) in known for s in strands
+                )
+            yield SpliceJunction(
+                reference_sequence=self._reference_sequences[reference_id],
+                start_c=start_c,
+                end_c=end_c,
+                strand=strand,
+                read_count=self._counts[key],
+                known=is_known,
+            )
+
+
+def known_junctions(features: Iterable[Feature]) -> set[JunctionKey]:
+    """Introns between consecutive exons of all transcripts."""
+    result: set[JunctionKey] = set()
+    for feature in features:
+        if not isinstance(feature, Transcript):
+            continue
+        exons = sorted(feature.exons, key=lambda exon: exon.start_c)
+        for exon, next_exon in zip(exons, exons[1:]):
+            if exon.end_c < next_exon.start_c:
+                result.add(
+                    (feature.sequence_id, exon.end_c, next_exon.start_c, feature.strand)
+                )
+    return result
+
+
+def _strand(alignment: Alignment) -> Strand | None:
+    for tag in alignment.bam_tags:
+        if tag.tag == "XS":
+            value = tag.value
+            if isinstance(value, bytes):
+                value = value.decode()
+            return value if value in ("+", "-") else None
+    return None
+
+
+def _sort_key(key: JunctionKey) -> tuple[str, int, int, str]:
+    reference_id, start_c, end_c, strand = key
+    return reference_id, start_c, end_c, strand or ""
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(f"Usage: {sys.argv[0]} <BAM file> [GTF file]", file=sys.stderr)
+        sys.exit(1)
+    counter = JunctionCounter()
+    with BAMReader(sys.argv[1], lazy=True) as reader:
+        counter.update(reader)
+    known: set[JunctionKey] | None = None
+    if len(sys.argv) > 2:
+        dialect = detect_dialect(Path(sys.argv[2]))
+        with GTFReader(sys.argv[2], dialect=dialect) as gtf_reader:
+            known = known_junctions(gtf_reader)
+    for junction in counter.iter_junctions(known):
+        fields = [
+            junction.reference_sequence.id,
+            str(junction.start_c),
+            str(junction.end_c),
+            junction.strand or ".",
+            str(junction.read_count),
+        ]
+        if junction.known is not None:
+            fields.append("known" if junction.known else "novel")
+        print("\t".join(fields))
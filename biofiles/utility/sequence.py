@@ -0,0 +1,135 @@
+"""Whole-buffer operations on nucleotide sequences.
+
+All functions accept Sequence, str or bytes and return the same type.
+Work is done by bytes.translate & friends in C rather than per character
+in Python; if NumPy is installed, it is used for translation and composition."""
+
+from dataclasses import replace
+from itertools import repeat
+from typing import TypeVar
+
+from biofiles.types.sequence import Sequence
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+__all__ = [
+    "STANDARD_GENETIC_CODE",
+    "composition",
+    "gc_content",
+    "reverse_complement",
+    "translate",
+]
+
+SequenceLike = TypeVar("SequenceLike", Sequence, str, bytes)
+
+STANDARD_GENETIC_CODE = (
+    "FFLLSSSSYY**CC*WLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG"
+)
+# Amino acids for codons in TCAG order (TTT, TTC, TTA, TTG, TCT, ...), NCBI table 1.
+
+
+def reverse_complement(sequence: SequenceLike) -> SequenceLike:
+    """Reverse complement, IUPAC ambiguity codes and case are respected."""
+    match sequence:
+        case Sequence():
+            return replace(sequence, sequence=reverse_complement(sequence.sequence))
+        case str():
+            return sequence.translate(_COMPLEMENT_STR)[::-1]
+        case _:
+            return sequence.translate(_COMPLEMENT_BYTES)[::-1]
+
+
+def translate(
+    sequence: SequenceLike, table: str = STANDARD_GENETIC_CODE
+) -> SequenceLike:
+    """Translate codons into amino acids, codons with ambiguous bases become X.
+    Trailing incomplete codon is ignored."""
+    match sequence:
+        case Sequence():
+            return replace(sequence, sequence=translate(sequence.sequence, table))
+        case str():
+            return _translate_bytes(sequence.encode("ascii"), table).decode("ascii")
+        case _:
+            return _translate_bytes(bytes(sequence), table)
+
+
+def composition(sequence: Sequence | str | bytes) -> dict[str, int]:
+    """Count occurrences of every character (case-sensitive)."""
+    data = _to_bytes(sequence)
+    if np is not None and data:
+        counts = np.bincount(np.frombuffer(data, dtype=np.uint8), minlength=256)
+        return {chr(code): int(counts[code]) for code in np.flatnonzero(counts)}
+    return {chr(code): data.count(code) for code in sorted(set(data))}
+
+
+def gc_content(sequence: Sequence | str | bytes) -> float:
+    """Fraction of G and C among unambiguous (A, C, G, T) bases, case-insensitive."""
+    counts = composition(sequence)
+    gc = sum(counts.get(base, 0) for base in "GCgc")
+    total = gc + sum(counts.get(base, 0) for base in "ATat")
+    return gc / total if total else 0.0
+
+
+def _to_bytes(sequence: Sequence | str | bytes) -> bytes:
+    match sequence:
+        case Sequence():
+            return sequence.sequence.encode("ascii")
+        case str():
+            return sequence.encode("ascii")
+        case _:
+            return bytes(sequence)
+
+
+def _translate_bytes(data: bytes, table: str) -> bytes:
+    if len(table) != 64:
+        raise ValueError(
+            f"expected genetic code table of 64 amino acids, got {table!r}"
+        )
+    num_codons = len(data) // 3
+    if np is not None and num_codons:
+        return _translate_bytes_numpy(data[: num_codons * 3], table)
+    codon_to_amino_acid = _codon_mapping(table)
+    data = data.translate(_NORMALIZE_BASES)
+    codons = [data[i : i + 3] for i in range(0, num_codons * 3, 3)]
+    return b"".join(map(codon_to_amino_acid.get, codons, repeat(b"X")))
+
+
+def _translate_bytes_numpy(data: bytes, table: str) -> bytes:
+    codes = _NUMPY_BASE_CODES[np.frombuffer(data, dtype=np.uint8)].reshape(-1, 3)
+    indices = codes[:, 0] * 16 + codes[:, 1] * 4 + codes[:, 2]
+    ambiguous = (codes > 3).any(axis=1)
+    amino_acids = np.frombuffer(table.encode("ascii") + b"X", dtype=np.uint8)
+    return amino_acids[np.where(ambiguous, 64, indices)].tobytes()
+
+
+def _codon_mapping(table: str) -> dict[bytes, bytes]:
+    if table == STANDARD_GENETIC_CODE:
+        return _STANDARD_CODON_MAPPING
+    return _make_codon_mapping(table)
+
+
+def _make_codon_mapping(table: str) -> dict[bytes, bytes]:
+    codons = [f"{b1}{b2}{b3}" for b1 in "TCAG" for b2 in "TCAG" for b3 in "TCAG"]
+    return {
+        codon.encode("ascii"): amino_acid.encode("ascii")
+        for codon, amino_acid in zip(codons, table)
+    }
+
+
+_COMPLEMENT_FROM = "ACGTURYKMBVDHNSWacgturykmbvdhnsw"
+_COMPLEMENT_TO = "TGCAAYRMKVBHDNSWtgcaayrmkvbhdnsw"
+_COMPLEMENT_STR = str.maketrans(_COMPLEMENT_FROM, _COMPLEMENT_TO)
+_COMPLEMENT_BYTES = bytes.maketrans(
+    _COMPLEMENT_FROM.encode("ascii"), _COMPLEMENT_TO.encode("ascii")
+)
+_NORMALIZE_BASES = bytes.maketrans(b"acgtuU", b"ACGTTT")
+_STANDARD_CODON_MAPPING = _make_codon_mapping(STANDARD_GENETIC_CODE)
+
+if np is not None:
+    _NUMPY_BASE_CODES = np.full(256, 4, dtype=np.uint8)
+    for _code, _bases in enumerate(["TtUu", "Cc", "Aa", "Gg"]):
+        _NUMPY_BASE_CODES[[ord(base) for base in _bases]] = _code
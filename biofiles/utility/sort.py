@@ -0,0 +1,145 @@
+"""External-memory coordinate sort of BAM files.
+
+Raw records are accumulated until `memory_limit` is reached, sorted and spilled
+into temporary BGZF-compressed BAM files (runs), which are then k-way merged.
+Records are never decoded beyond their fixed fields."""
+
+import heapq
+import re
+import tempfile
+from contextlib import ExitStack
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator
+
+from biofiles.bam import BAMReader, BAMRecord, BAMWriter
+from biofiles.types.alignment import ReferenceSequence
+
+
+__all__ = ["DEFAULT_MAX_RUNS_PER_MERGE", "DEFAULT_MEMORY_LIMIT", "sort_bam"]
+
+DEFAULT_MEMORY_LIMIT = 768 << 20
+DEFAULT_MAX_RUNS_PER_MERGE = 64
+
+
+def sort_bam(
+    input_: BinaryIO | Path | str,
+    output: BinaryIO | Path | str,
+    memory_limit: int = DEFAULT_MEMORY_LIMIT,
+    threads: int = 1,
+    temporary_directory: Path | str | None = None,
+    max_runs_per_merge: int = DEFAULT_MAX_RUNS_PER_MERGE,
+) -> None:
+    """Sort BAM file by reference sequence and position, keeping the original
+    order of alignments with equal coordinates; unmapped alignments without
+    a reference sequence go last. `threads` are used for BGZF compression
+    of both temporary runs and the output. At most `max_runs_per_merge`
+    temporary runs are open at once, more are merged in several passes."""
+    if max_runs_per_merge < 2:
+        raise ValueError("max_runs_per_merge should be at least 2")
+    with ExitStack() as stack:
+        reader = stack.enter_context(BAMReader(input_, threads=threads))
+        header_text = _sorted_header_text(reader.header_text)
+        reference_sequences = reader.reference_sequences
+
+        tmp_dir = ""
+        run_paths: list[Path] = []
+        run: list[BAMRecord] = []
+        run_size = 0
+        for record in reader.iter_records():
+            run.append(record)
+            run_size += len(record.data) + _RECORD_OVERHEAD
+            if run_size >= memory_limit:
+                if not run_paths:
+                    tmp_dir = stack.enter_context(
+                        tempfile.TemporaryDirectory(dir=temporary_directory)
+                    )
+                run_path = Path(tmp_dir) / f"run{len(run_paths)}.bam"
+                run.sort(key=_sort_key)
+                _write_run(run_path, run, reference_sequences, threads)
+                run_paths.append(run_path)
+                run, run_size = [], 0
+        run.sort(key=_sort_key)
+
+        num_merged_runs = 0
+        while len(run_paths) + 1 > max_runs_per_merge:
+            # Consecutive runs are merged, so that their order is kept.
+            merged_run_paths: list[Path] = []
+            for i in range(0, len(run_paths), max_runs_per_merge):
+                group = run_paths[i : i + max_runs_per_merge]
+                if len(group) == 1:
+                    merged_run_paths.extend(group)
+                    continue
+                merged_run_path = Path(tmp_dir) / f"merged{num_merged_runs}.bam"
+                num_merged_runs += 1
+                _merge_runs(group, merged_run_path, reference_sequences, threads)
+                merged_run_paths.append(merged_run_path)
+            run_paths = merged_run_paths
+
+        runs: list[Iterable[BAMRecord]] = []
+        for run_path in run_paths:
+            # Runs are decompressed without threads, otherwise each of them
+            # would start its own thread pool.
+            run_reader = stack.enter_context(BAMReader(run_path))
+            runs.append(run_reader.iter_records())
+        runs.append(run)
+        writer = stack.enter_context(
+            BAMWriter(output, reference_sequences, header_text, threads=threads)
+        )
+        for record in _merge(runs):
+            writer.write_record(record)
+
+
+def _write_run(
+    path: Path,
+    records: Iterable[BAMRecord],
+    reference_sequences: list[ReferenceSequence],
+    threads: int,
+) -> None:
+    with BAMWriter(
+        path, reference_sequences, threads=threads, compression_level=1
+    ) as writer:
+        for record in records:
+            writer.write_record(record)
+
+
+def _merge_runs(
+    run_paths: list[Path],
+    path: Path,
+    reference_sequences: list[ReferenceSequence],
+    threads: int,
+) -> None:
+    with ExitStack() as stack:
+        runs = [
+            stack.enter_context(BAMReader(run_path)).iter_records()
+            for run_path in run_paths
+        ]
+        _write_run(path, _merge(runs), reference_sequences, threads)
+    for run_path in run_paths:
+        run_path.unlink()
+
+
+def _merge(runs: list[Iterable[BAMRecord]]) -> Iterator[BAMRecord]:
+    # heapq.merge keeps the order of runs for equal keys, runs go in input order.
+    if len(runs) == 1:
+        return iter(runs[0])
+    return heapq.merge(*runs, key=_sort_key)
+
+
+def _sort_key(record: BAMRecord) -> tuple[int, int]:
+    # Reference index -1 (no reference sequence) becomes the largest one.
+    return record.reference_idx & 0xFFFFFFFF, record.start_c
+
+
+def _sorted_header_text(header_text: str) -> str:
+    lines = header_text.splitlines(keepends=True)
+    if lines and lines[0].startswith("@HD"):
+        hd_line = _SORT_ORDER_PATTERN.sub("", lines[0].rstrip("\r\n"))
+        lines[0] = f"{hd_line}\tSO:coordinate\n"
+    else:
+        lines.insert(0, "@HD\tVN:1.6\tSO:coordinate\n")
+    return "".join(lines)
+
+
+_RECORD_OVERHEAD = 200
+# Approximate memory used by BAMRecord besides the record bytes.
+_SORT_ORDER_PATTERN = re.compile(r"\tSO:[^\t]*")
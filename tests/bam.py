@@ -0,0 +1,560 @@
+import dataclasses
+import gzip
+import pathlib
+import struct
+
+import pytest
+
+from biofiles.bai import BAIReader, BAIWriter, build_bai, reg2bin, reg2bins
+from biofiles.bam import (
+    BATCH_FIELDS,
+    BAMReader,
+    BAMWriter,
+    LazyAlignment,
+    process_references,
+)
+from biofiles.bgzf import BGZFWriter
+from biofiles.types.alignment import (
+    Alignment,
+    BAIChunk,
+    BAIReferenceStats,
+    BAMFilter,
+    BAMFlag,
+    BAMTag,
+    CIGAR,
+    CIGAROperation,
+    ReferenceAlignmentCounts,
+    ReferenceSequence,
+)
+from tests.common import make_alignment
+
+
+def _encode_header(text: str, references: list[tuple[str, int]]) -> bytes:
+    parts = [b"BAM\1", struct.pack("<I", len(text)), text.encode()]
+    parts.append(struct.pack("<I", len(references)))
+    for name, length in references:
+        name_bytes = name.encode() + b"\0"
+        parts.append(struct.pack("<I", len(name_bytes)) + name_bytes)
+        parts.append(struct.pack("<I", length))
+    return b"".join(parts)
+
+
+def _encode_record(
+    ref_id: int,
+    pos: int,
+    name: str,
+    flags: int,
+    cigar: list[tuple[int, int]],
+    seq: str,
+    tags: bytes = b"",
+) -> bytes:
+    name_bytes = name.encode() + b"\0"
+    codes = ["=ACMGRSVTWYHKDBN".index(c) for c in seq] + [0]
+    body = b"".join(
+        [
+            struct.pack(
+                "<iiBBHHHIiii",
+                ref_id,
+                pos,
+                len(name_bytes),
+                60,
+                4681,
+                len(cigar),
+                flags,
+                len(seq),
+                -1,
+                -1,
+                0,
+            ),
+            name_bytes,
+            struct.pack(f"<{len(cigar)}I", *(n << 4 | op for n, op in cigar)),
+            bytes(codes[i] << 4 | codes[i + 1] for i in range(0, len(seq), 2)),
+            bytes(range(30, 30 + len(seq))),
+            tags,
+        ]
+    )
+    return struct.pack("<I", len(body)) + body
+
+
+def _write_test_bam(path: pathlib.Path) -> list[int]:
+    """Write three alignments into separate BGZF blocks, return their virtual
+    offsets followed by the virtual offset of the end of the last one."""
+    offsets = []
+    with BGZFWriter(path) as w:
+        w.write(_encode_header("@HD\tVN:1.6\n", [("chr1", 1000), ("chr2", 500)]))
+        records = [
+            _encode_record(0, 10, "read1", 0, [(5, 0)], "ACGTN", b"NMC\x01XSZ+\0"),
+            _encode_record(0, 20, "read2", 16, [(2, 0), (100, 3), (2, 0)], "ACGT"),
+            _encode_record(1, 5, "read3", 0, [(3, 0)], "GGG", b"XBBc\2\0\0\0\1\xff"),
+        ]
+        for record in records:
+            w.flush()
+            offsets.append(w.tell())
+            w.write(record)
+        w.flush()
+        offsets.append(w.tell())
+    return offsets
+
+
+def _encode_bai(
+    references: list[tuple[dict[int, list[tuple[int, int]]], list[int]]],
+) -> bytes:
+    parts = [b"BAI\1", struct.pack("<i", len(references))]
+    for bins, linear_index in references:
+        parts.append(struct.pack("<i", len(bins)))
+        for bin_, chunks in bins.items():
+            parts.append(struct.pack("<Ii", bin_, len(chunks)))
+            parts.extend(struct.pack("<QQ", *chunk) for chunk in chunks)
+        parts.append(
+            struct.pack(f"<i{len(linear_index)}Q", len(linear_index), *linear_index)
+        )
+    return b"".join(parts)
+
+
+def test_read_bam(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "alignments.bam"
+    _write_test_bam(path)
+    with BAMReader(path) as r:
+        alignments = [*r]
+
+    assert [a.read_name for a in alignments] == ["read1", "read2", "read3"]
+    first = alignments[0]
+    assert first.reference_sequence == ReferenceSequence(id="chr1", length=1000)
+    assert first.start_c == 10
+    assert first.cigar == CIGAR(operations=(CIGAROperation(kind="M", count=5),))
+    assert first.read_sequence == "ACGTN"
+    assert first.quality == "\x1e\x1f\x20\x21\x22"
+    assert first.bam_tags == (BAMTag(tag="NM", value=1), BAMTag(tag="XS", value="+"))
+    assert str(alignments[1].cigar) == "2M100N2M"
+    assert alignments[2].bam_tags == (BAMTag(tag="XB", value=(1, -1)),)
+
+
+def test_seek_bam(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "alignments.bam"
+    offsets = _write_test_bam(path)
+    with BAMReader(path) as r:
+        assert r.tell() == offsets[0]
+        next(r)
+        assert r.tell() == offsets[1]
+        r.seek(offsets[2])
+        assert next(r).read_name == "read3"
+        r.seek(offsets[1])
+        assert [a.read_name for a in r] == ["read2", "read3"]
+
+
+def _write_test_bai(path: pathlib.Path, offsets: list[int]) -> None:
+    path.write_bytes(
+        _encode_bai(
+            [
+                ({4681: [(offsets[0], offsets[2])]}, [offsets[0]]),
+                ({4681: [(offsets[2], offsets[3])]}, [offsets[2]]),
+            ]
+        )
+    )
+
+
+def test_reg2bin() -> None:
+    assert reg2bin(10, 15) == 4681
+    assert reg2bin(16383, 16385) == 585
+    assert reg2bin(0, 1 << 29) == 0
+    assert reg2bins(10, 15) == [0, 1, 9, 73, 585, 4681]
+
+
+def test_fetch_bam(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "alignments.bam"
+    offsets = _write_test_bam(path)
+    _write_test_bai(tmp_path / "alignments.bam.bai", offsets)
+    with BAIReader(tmp_path / "alignments.bam.bai") as r:
+        index = r.read()
+    assert len(index.references) == 2
+    assert index.references[0].linear_index == (offsets[0],)
+
+    with BAMReader(path) as r:
+        assert [a.read_name for a in r.fetch("chr1", 0, 15)] == ["read1"]
+        assert [a.read_name for a in r.fetch("chr1", 15, 21)] == ["read2"]
+        assert [a.read_name for a in r.fetch("chr1", 100, 110)] == ["read2"]
+        assert [a.read_name for a in r.fetch("chr1", 0, 1000)] == ["read1", "read2"]
+        assert [a.read_name for a in r.fetch("chr2", 0, 5)] == []
+        assert [a.read_name for a in r.fetch("chr2", 0, 6)] == ["read3"]
+        assert [a.read_name for a in r.fetch_records("chr1", 100, 110)] == ["read2"]
+
+
+def test_read_bam_lazy(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "alignments.bam"
+    _write_test_bam(path)
+    with BAMReader(path) as r:
+        alignments = [*r]
+    with BAMReader(path, lazy=True) as r:
+        lazy_alignments = [*r]
+
+    assert all(isinstance(a, LazyAlignment) for a in lazy_alignments)
+    assert "cigar" not in vars(lazy_alignments[0])
+    for alignment, lazy_alignment in zip(alignments, lazy_alignments, strict=True):
+        assert lazy_alignment.bam_flags == alignment.bam_flags
+        assert lazy_alignment.cigar == alignment.cigar
+        assert lazy_alignment.read_sequence == alignment.read_sequence
+        assert lazy_alignment.quality == alignment.quality
+        assert lazy_alignment.bam_tags == alignment.bam_tags
+        assert lazy_alignment.end_c == alignment.end_c
+    assert lazy_alignments[0].cigar is lazy_alignments[0].cigar
+
+
+def test_lazy_alignment_equality(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "alignments.bam"
+    _write_test_bam(path)
+    with BAMReader(path) as r:
+        alignments = [*r]
+    with BAMReader(path, lazy=True) as r:
+        lazy_alignments = [*r]
+
+    assert lazy_alignments == alignments
+    assert alignments == lazy_alignments
+    assert lazy_alignments[0] != alignments[1]
+    assert {*lazy_alignments} == {*alignments}
+    assert [a.eager() for a in lazy_alignments] == alignments
+    assert all(type(a.eager()) is Alignment for a in lazy_alignments)
+
+    replaced = dataclasses.replace(lazy_alignments[1], read_name="renamed")
+    assert replaced == dataclasses.replace(alignments[1], read_name="renamed")
+    assert replaced.cigar == alignments[1].cigar
+
+
+def test_read_bam_tag_types(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "alignments.bam"
+    tags = b"".join(
+        [
+            b"XAAx",
+            b"XFf" + struct.pack("<f", 0.5),
+            b"XIi" + struct.pack("<i", -70000),
+            b"XHH1AE301\0",
+            b"XBBS" + struct.pack("<IHH", 2, 1, 65535),
+            b"MDZ3\0",
+        ]
+    )
+    with BGZFWriter(path) as w:
+        w.write(_encode_header("", [("chr1", 1000)]))
+        w.write(_encode_record(0, 1, "read", 0, [(3, 0)], "ACG", tags))
+    with BAMReader(path) as r:
+        (alignment,) = r
+    assert alignment.bam_tags == (
+        BAMTag(tag="XA", value=b"x"),
+        BAMTag(tag="XF", value=0.5),
+        BAMTag(tag="XI", value=-70000),
+        BAMTag(tag="XH", value="1AE301"),
+        BAMTag(tag="XB", value=(1, 65535)),
+        BAMTag(tag="MD", value="3"),
+    )
+    assert alignment.read_sequence == "ACG"
+
+
+def test_iter_batches(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "alignments.bam"
+    _write_test_bam(path)
+    with BAMReader(path) as r:
+        batches = [*r.iter_batches(2, fields=["reference_idx", "start_c", "bam_flags"])]
+
+    assert [len(batch["start_c"]) for batch in batches] == [2, 1]
+    assert [*batches[0]] == ["reference_idx", "start_c", "bam_flags"]
+    assert [int(x) for b in batches for x in b["reference_idx"]] == [0, 0, 1]
+    assert [int(x) for b in batches for x in b["start_c"]] == [10, 20, 5]
+    assert [int(x) for b in batches for x in b["bam_flags"]] == [0, 16, 0]
+
+    with BAMReader(path) as r:
+        (batch,) = r.iter_batches()
+    assert [*batch] == [*BATCH_FIELDS]
+    assert [int(x) for x in batch["read_length"]] == [5, 4, 3]
+    assert [int(x) for x in batch["next_reference_idx"]] == [-1, -1, -1]
+
+
+def test_write_bam(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "alignments.bam"
+    _write_test_bam(path)
+    with BAMReader(path) as r:
+        alignments = [*r]
+        with BAMWriter(
+            tmp_path / "copy.bam", r.reference_sequences, r.header_text, threads=2
+        ) as w:
+            for alignment in alignments:
+                w.write(alignment)
+
+    assert gzip.decompress((tmp_path / "copy.bam").read_bytes()) == gzip.decompress(
+        path.read_bytes()
+    )
+    with BAMReader(tmp_path / "copy.bam") as r:
+        assert r.header_text == "@HD\tVN:1.6\n"
+        assert [*r] == alignments
+
+
+def test_write_bam_tags(tmp_path: pathlib.Path) -> None:
+    reference = ReferenceSequence(id="chr1", length=1000)
+    tags = (
+        BAMTag(tag="XA", value=b"x"),
+        BAMTag(tag="XC", value=200),
+        BAMTag(tag="XS", value=-300),
+        BAMTag(tag="XI", value=1 << 20),
+        BAMTag(tag="XF", value=0.5),
+        BAMTag(tag="XZ", value="text"),
+        BAMTag(tag="XB", value=(1, -1, 1000)),
+        BAMTag(tag="XG", value=(0.25, 1.5)),
+    )
+    alignment = dataclasses.replace(
+        make_alignment(reference, 100, "3M", mapping_quality=30, tags=tags),
+        quality="",
+    )
+    with BAMWriter(tmp_path / "alignments.bam", [reference]) as w:
+        w.write(alignment)
+    with BAMReader(tmp_path / "alignments.bam") as r:
+        (read_alignment,) = r
+    assert read_alignment.bam_tags == tags
+    assert read_alignment.quality == ""
+    assert read_alignment.bai_index_bin == 4681
+
+
+def test_copy_bam_records(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "alignments.bam"
+    _write_test_bam(path)
+    with BAMReader(path) as r:
+        records = [*r.iter_records()]
+        with BAMWriter(tmp_path / "copy.bam", r.reference_sequences) as w:
+            for record in records:
+                if record.bam_flags & BAMFlag.READ_SEQUENCE_REVERSE_COMPLEMENTED:
+                    continue
+                w.write_record(record)
+
+    assert [r.read_name for r in records] == ["read1", "read2", "read3"]
+    assert [r.reference_idx for r in records] == [0, 0, 1]
+    assert [r.end_c for r in records] == [15, 124, 8]
+    with BAMReader(path) as r:
+        alignments = [*r]
+    with BAMReader(tmp_path / "copy.bam") as r:
+        assert [*r] == [alignments[0], alignments[2]]
+
+
+def test_read_bam_filter(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "alignments.bam"
+    _write_test_bam(path)
+
+    def read_names(filter_: BAMFilter) -> list[str]:
+        with BAMReader(path, filter_=filter_) as r:
+            return [a.read_name for a in r]
+
+    reverse = BAMFlag.READ_SEQUENCE_REVERSE_COMPLEMENTED
+    assert read_names(BAMFilter()) == ["read1", "read2", "read3"]
+    assert read_names(BAMFilter(excluded_flags=reverse)) == ["read1", "read3"]
+    assert read_names(BAMFilter(required_flags=reverse)) == ["read2"]
+    assert read_names(BAMFilter(reference_ids=["chr2"])) == ["read3"]
+    assert read_names(BAMFilter(min_mapping_quality=61)) == []
+    with BAMReader(path, filter_=BAMFilter(reference_ids={"chr1"})) as r:
+        assert [len(b["start_c"]) for b in r.iter_batches()] == [2]
+
+
+def test_fetch_filter(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "alignments.bam"
+    reference = ReferenceSequence(id="chr1", length=100_000)
+    duplicate = BAMFlag.DUPLICATE
+    with BAMWriter(path, [reference]) as w:
+        w.write(make_alignment(reference, 15000, "2000M", duplicate, "long_dup"))
+        w.write(make_alignment(reference, 15500, "50M", duplicate, "gap"))
+        w.write(make_alignment(reference, 16400, "50M", 0, "target"))
+    with BAIWriter(tmp_path / "alignments.bam.bai") as w:
+        w.write(build_bai(path))
+    # Records of the first chunk are all rejected, the next chunk must not
+    # be read past its end.
+    with BAMReader(path, filter_=BAMFilter(excluded_flags=duplicate)) as r:
+        assert [a.read_name for a in r.fetch("chr1", 16390, 16500)] == ["target"]
+
+
+def _read_names_by_reference(
+    reader: BAMReader, references: list[ReferenceSequence]
+) -> list[tuple[str, list[str]]]:
+    return [
+        (ref.id, [a.read_name for a in reader.fetch(ref.id, 0, ref.length)])
+        for ref in references
+    ]
+
+
+def test_process_references(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "alignments.bam"
+    offsets = _write_test_bam(path)
+    _write_test_bai(tmp_path / "alignments.bai", offsets)
+
+    result = process_references(path, _read_names_by_reference, processes=2)
+    assert result == [("chr1", ["read1", "read2"]), ("chr2", ["read3"])]
+
+
+def test_process_no_references(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "alignments.bam"
+    with BGZFWriter(path) as w:
+        w.write(_encode_header("", []))
+        w.write(_encode_record(-1, -1, "unmapped", 4, [], "A"))
+    with BAIWriter(tmp_path / "alignments.bam.bai") as w:
+        w.write(build_bai(path))
+    assert process_references(path, _read_names_by_reference, processes=2) == []
+
+
+def test_build_bai(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "alignments.bam"
+    offsets = _write_test_bam(path)
+    index = build_bai(path)
+
+    chr1, chr2 = index.references
+    assert chr1.bins == {4681: (BAIChunk(start=offsets[0], end=offsets[2]),)}
+    assert chr1.linear_index == (offsets[0],)
+    assert chr1.stats == BAIReferenceStats(
+        start=offsets[0], end=offsets[2], mapped_count=2, unmapped_count=0
+    )
+    assert chr2.bins == {4681: (BAIChunk(start=offsets[2], end=offsets[3]),)}
+    assert index.unplaced_unmapped_count == 0
+
+    with BAIWriter(tmp_path / "alignments.bam.bai") as w:
+        w.write(index)
+    with BAIReader(tmp_path / "alignments.bam.bai") as r:
+        assert r.read() == index
+    with BAMReader(path) as r:
+        assert [a.read_name for a in r.fetch("chr1", 100, 110)] == ["read2"]
+
+
+def test_build_bai_long_alignment(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "alignments.bam"
+    with BGZFWriter(path) as w:
+        w.write(_encode_header("", [("chr1", 100_000)]))
+        w.write(_encode_record(0, 10, "long", 0, [(40_000, 0)], ""))
+        w.write(_encode_record(0, 20_000, "short", 0, [(10, 0)], ""))
+        w.write(_encode_record(-1, -1, "unmapped", 4, [], "A"))
+    (chr1,) = build_bai(path).references
+    assert len(chr1.linear_index) == 3
+    assert chr1.linear_index[0] == chr1.linear_index[2] == chr1.stats.start
+    assert build_bai(path).unplaced_unmapped_count == 1
+
+
+def test_fetch_placed_unmapped(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "alignments.bam"
+    chr1 = ReferenceSequence(id="chr1", length=100_000)
+    unmapped = make_alignment(
+        chr1, 16_380, "10M", flags=BAMFlag.SEGMENT_UNMAPPED, read_name="unmapped"
+    )
+    assert unmapped.end_c == 16_381
+    with BAMWriter(path, [chr1]) as w:
+        w.write(make_alignment(chr1, 16_370, "20M", read_name="mapped"))
+        w.write(unmapped)
+    with BAIWriter(tmp_path / "alignments.bam.bai") as w:
+        w.write(build_bai(path))
+    with BAMReader(path) as r:
+        assert [a.bai_index_bin for a in r] == [
+            reg2bin(16_370, 16_390),
+            reg2bin(16_380, 16_381),
+        ]
+        assert [a.read_name for a in r.fetch("chr1", 16_380, 16_381)] == [
+            "mapped",
+            "unmapped",
+        ]
+        assert [a.read_name for a in r.fetch("chr1", 16_384, 16_390)] == ["mapped"]
+
+
+def test_build_bai_unsorted(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "alignments.bam"
+    with BGZFWriter(path) as w:
+        w.write(_encode_header("", [("chr1", 1000)]))
+        w.write(_encode_record(0, 20, "read1", 0, [(5, 0)], "ACGTA"))
+        w.write(_encode_record(0, 10, "read2", 0, [(5, 0)], "ACGTA"))
+    with pytest.raises(ValueError, match="not sorted"):
+        build_bai(path)
+
+
+def _write_paired_bam(path: pathlib.Path) -> list[ReferenceSequence]:
+    chr1 = ReferenceSequence(id="chr1", length=1000)
+    chr2 = ReferenceSequence(id="chr2", length=500)
+    paired = BAMFlag.MULTIPLE_SEGMENTS
+    proper = paired | BAMFlag.EACH_SEGMENT_PROPERLY_ALIGNED
+    alignments = [
+        (chr1, 10, proper | BAMFlag.FIRST_SEGMENT, 60, chr1),
+        (chr1, 50, proper | BAMFlag.LAST_SEGMENT, 60, chr1),
+        (
+            chr1,
+            70,
+            paired | BAMFlag.FIRST_SEGMENT | BAMFlag.NEXT_SEGMENT_UNMAPPED,
+            0,
+            chr1,
+        ),
+        (chr1, 70, paired | BAMFlag.LAST_SEGMENT | BAMFlag.SEGMENT_UNMAPPED, 0, chr1),
+        (chr2, 5, paired | BAMFlag.FIRST_SEGMENT, 30, chr1),
+        (chr2, 5, paired | BAMFlag.FIRST_SEGMENT | BAMFlag.SECONDARY_SEGMENT, 30, chr1),
+        (
+            None,
+            -1,
+            BAMFlag.SEGMENT_UNMAPPED
+            | BAMFlag.DUPLICATE
+            | BAMFlag.NOT_PASSING_QUALITY_CONTROL,
+            0,
+            None,
+        ),
+    ]
+    with BAMWriter(path, [chr1, chr2]) as w:
+        for reference, start_c, flags, mapping_quality, mate_reference in alignments:
+            w.write(
+                make_alignment(
+                    reference,
+                    start_c,
+                    "3M",
+                    flags=flags,
+                    mapping_quality=mapping_quality,
+                    next_reference=mate_reference,
+                )
+            )
+    return [chr1, chr2]
+
+
+def test_summarize(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "alignments.bam"
+    chr1, chr2 = _write_paired_bam(path)
+    with BAMReader(path) as r:
+        summary = r.summarize()
+    assert summary.total_count == 7
+    assert summary.qc_failed_count == 1
+    assert summary.secondary_count == 1
+    assert summary.supplementary_count == 0
+    assert summary.duplicate_count == 1
+    assert summary.mapped_count == 5
+    assert summary.paired_count == 5
+    assert summary.read1_count == 3
+    assert summary.read2_count == 2
+    assert summary.properly_paired_count == 2
+    assert summary.mate_mapped_count == 3
+    assert summary.singleton_count == 1
+    assert summary.mate_on_other_reference_count == 1
+    assert {
+        mapping_quality: count
+        for mapping_quality, count in enumerate(summary.mapping_quality_histogram)
+        if count
+    } == {0: 3, 30: 2, 60: 2}
+    assert summary.reference_counts == (
+        ReferenceAlignmentCounts(chr1, mapped_count=3, unmapped_count=1),
+        ReferenceAlignmentCounts(chr2, mapped_count=2, unmapped_count=0),
+        ReferenceAlignmentCounts(None, mapped_count=0, unmapped_count=1),
+    )
+
+
+def test_reference_counts_from_index(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "alignments.bam"
+    _write_paired_bam(path)
+    with BAMReader(path) as r:
+        expected = r.reference_counts()
+    with BAIWriter(tmp_path / "alignments.bam.bai") as w:
+        w.write(build_bai(path))
+    with BAMReader(path) as r:
+        assert r.reference_counts() == expected
+        # Taken from the index, so alignments are not consumed.
+        assert next(r).start_c == 10
+
+
+def test_reference_counts_from_index_without_stats(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "alignments.bam"
+    _write_paired_bam(path)
+    with BAMReader(path) as r:
+        expected = r.reference_counts()
+    index = build_bai(path)
+    references = [dataclasses.replace(ref, stats=None) for ref in index.references]
+    with BAIWriter(tmp_path / "alignments.bam.bai") as w:
+        w.write(dataclasses.replace(index, references=tuple(references)))
+    with BAMReader(path) as r:
+        assert r.reference_counts() == expected
@@ -0,0 +1,82 @@
+import gzip
+import pathlib
+
+from biofiles.bgzf import BGZFReader, BGZFWriter, MAX_BLOCK_DATA_SIZE
+
+
+def test_write_and_read_bgzf(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "data.gz"
+    data = bytes(range(256)) * 1000
+    with BGZFWriter(path) as w:
+        w.write(data[:1000])
+        w.flush()
+        middle_offset = w.tell()
+        w.write(data[1000:])
+
+    assert gzip.decompress(path.read_bytes()) == data
+
+    with BGZFReader(path) as r:
+        assert r.read(10) == data[:10]
+        assert r.read() == data[10:]
+        assert r.read(10) == b""
+
+        r.seek(middle_offset)
+        assert r.read(10) == data[1000:1010]
+        position = r.tell()
+        r.read(MAX_BLOCK_DATA_SIZE * 2)
+        r.seek(position)
+        assert r.read(10) == data[1010:1020]
+
+
+def test_read_bgzf_threaded(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "data.gz"
+    data = bytes(range(256)) * 2000
+    offsets = []
+    with BGZFWriter(path) as w:
+        for offset in range(0, len(data), 10_000):
+            w.flush()
+            offsets.append(w.tell())
+            w.write(data[offset : offset + 10_000])
+
+    with BGZFReader(path, threads=4) as r:
+        assert r.read(10) == data[:10]
+        assert r.read() == data[10:]
+        r.seek(offsets[30])
+        assert r.read(10) == data[300_000:300_010]
+        r.seek(offsets[2])
+        assert r.read(20_000) == data[20_000:40_000]
+        r.seek(offsets[3])
+        assert r.read() == data[30_000:]
+
+
+def test_write_bgzf_threaded(tmp_path: pathlib.Path) -> None:
+    data = bytes(range(256)) * 2000
+    middle_offsets = []
+    for name, threads in [("single.gz", 1), ("threaded.gz", 4)]:
+        with BGZFWriter(tmp_path / name, threads=threads) as w:
+            w.write(data[:1000])
+            w.flush()
+            middle_offsets.append(w.tell())
+            w.write(data[1000:])
+
+    threaded = (tmp_path / "threaded.gz").read_bytes()
+    assert threaded == (tmp_path / "single.gz").read_bytes()
+    assert gzip.decompress(threaded) == data
+    middle_offset = middle_offsets[1]
+    assert middle_offset == middle_offsets[0]
+    with BGZFReader(tmp_path / "threaded.gz") as r:
+        r.seek(middle_offset)
+        assert r.read(10) == data[1000:1010]
+
+
+def test_skip_bgzf(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "data.gz"
+    data = bytes(range(256)) * 1000
+    with BGZFWriter(path) as w:
+        w.write(data)
+
+    with BGZFReader(path) as r:
+        assert r.skip(100_000) == 100_000
+        assert r.read(10) == data[100_000:100_010]
+        assert r.skip(1_000_000) == len(data) - 100_010
+        assert r.read() == b""
@@ -0,0 +1,45 @@
+from biofiles.types.alignment import (
+    Alignment,
+    BAMTag,
+    CIGAR,
+    CIGAROperation,
+    ReferenceSequence,
+)
+
+
+def make_alignment(
+    reference: ReferenceSequence | None,
+    start_c: int,
+    cigar: str,
+    flags: int = 0,
+    read_name: str = "read",
+    mapping_quality: int = 60,
+    next_reference: ReferenceSequence | None = None,
+    tags: tuple[BAMTag, ...] = (),
+) -> Alignment:
+    """Alignment with CIGAR given as a string (e.g. "2S5M86N10M")
+    and a dummy read sequence and quality of matching length."""
+    operations = []
+    count = ""
+    for character in cigar:
+        if character.isdigit():
+            count += character
+        else:
+            operations.append(CIGAROperation(kind=character, count=int(count)))
+            count = ""
+    read_length = sum(op.count for op in operations if op.kind in "MIS=X")
+    return Alignment(
+        reference_sequence=reference,
+        start_c=start_c,
+        read_name=read_name,
+        mapping_quality=mapping_quality,
+        bai_index_bin=0,
+        next_reference_sequence=next_reference,
+        next_start_c=-1,
+        template_length=0,
+        cigar=CIGAR(operations=tuple(operations)),
+        read_sequence="A" * read_length,
+        quality="I" * read_length,
+        bam_flags=flags,
+        bam_tags=tags,
+    )
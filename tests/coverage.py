@@ -0,0 +1,85 @@
+import pathlib
+
+import pytest
+
+from biofiles.types.alignment import BAMFlag, CoverageInterval, ReferenceSequence
+from biofiles.utility.coverage import (
+    BedGraphWriter,
+    iter_binned_coverage,
+    iter_coverage,
+)
+from tests.common import make_alignment
+
+CHR1 = ReferenceSequence(id="chr1", length=16)
+CHR2 = ReferenceSequence(id="chr2", length=5)
+
+
+ALIGNMENTS = [
+    make_alignment(CHR1, 0, "5M"),
+    make_alignment(CHR1, 0, "10M", flags=BAMFlag.DUPLICATE),
+    make_alignment(CHR1, 2, "1S2M3D2M"),
+    make_alignment(CHR1, 3, "1M10N1M"),
+    make_alignment(CHR2, 0, "3M"),
+]
+
+
+def test_coverage() -> None:
+    intervals = [
+        (i.reference_sequence.id, i.start_c, i.end_c, i.depth)
+        for i in iter_coverage(ALIGNMENTS)
+    ]
+    assert intervals == [
+        ("chr1", 0, 2, 1),
+        ("chr1", 2, 3, 2),
+        ("chr1", 3, 4, 3),
+        ("chr1", 4, 5, 2),
+        ("chr1", 5, 9, 1),
+        ("chr1", 14, 15, 1),
+        ("chr2", 0, 3, 1),
+    ]
+
+
+def test_coverage_without_deletions() -> None:
+    intervals = [
+        (i.start_c, i.end_c, i.depth)
+        for i in iter_coverage(ALIGNMENTS, count_deletions=False)
+        if i.reference_sequence == CHR1
+    ]
+    assert intervals == [
+        (0, 2, 1),
+        (2, 3, 2),
+        (3, 4, 3),
+        (4, 5, 1),
+        (7, 9, 1),
+        (14, 15, 1),
+    ]
+
+
+def test_binned_coverage() -> None:
+    bins = [
+        (i.reference_sequence.id, i.start_c, i.end_c, i.depth)
+        for i in iter_binned_coverage(ALIGNMENTS, 4)
+    ]
+    assert bins == [
+        ("chr1", 0, 4, 1.75),
+        ("chr1", 4, 8, 1.25),
+        ("chr1", 8, 12, 0.25),
+        ("chr1", 12, 16, 0.25),
+        ("chr2", 0, 4, 0.75),
+        ("chr2", 4, 5, 0.0),
+    ]
+
+
+def test_coverage_unsorted() -> None:
+    with pytest.raises(ValueError, match="not sorted"):
+        [*iter_coverage(ALIGNMENTS[::-1])]
+
+
+def test_write_bedgraph(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "coverage.bedGraph"
+    with BedGraphWriter(path) as w:
+        w.write(CoverageInterval(reference_sequence=CHR1, start_c=0, end_c=2, depth=1))
+        w.write(
+            CoverageInterval(reference_sequence=CHR1, start_c=2, end_c=4, depth=0.5)
+        )
+    assert path.read_text() == "chr1\t0\t2\t1\nchr1\t2\t4\t0.500\n"
@@ -0,0 +1,49 @@
+import pathlib
+from io import BytesIO, StringIO
+
+import pytest
+
+from biofiles.fai import FAIIndex, FAIReader, FAIWriter, build_fai
+from biofiles.fasta import FASTAWriter
+from biofiles.types.sequence import Sequence
+
+
+@pytest.mark.parametrize("name", ["single_sequence", "multiple_sequences"])
+def test_build_fai(name: str) -> None:
+    path = pathlib.Path(__file__).parent / "files" / f"{name}.fasta"
+    with FAIReader(f"{path}.fai") as r:
+        expected = [*r]
+    assert [*build_fai(path)] == expected
+
+
+def test_build_fai_with_uneven_lines() -> None:
+    with pytest.raises(ValueError):
+        [*build_fai(BytesIO(b">SEQ\nATG\nA\nATG\n"))]
+
+
+def test_write_fasta_with_index() -> None:
+    io, index_io = StringIO(), StringIO()
+    w = FASTAWriter(io, width=4, index=index_io)
+    w.write(Sequence(id="SEQ1", description="Goose", sequence="GAGAGA"))
+    w.write(Sequence(id="EMPTY", description="", sequence=""))
+    w.write(Sequence(id="SEQ2", description="Walker", sequence="ATAT"))
+    expected = [*build_fai(BytesIO(io.getvalue().encode()))]
+    index_io.seek(0)
+    assert [*FAIReader(index_io)] == expected
+
+
+def test_load_fai_index(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "sequences.fasta.fai"
+    with FAIWriter(path) as w:
+        for seq_desc in build_fai(
+            pathlib.Path(__file__).parent / "files" / "multiple_sequences.fasta"
+        ):
+            w.write(seq_desc)
+
+    index = FAIIndex.load(path)
+    assert index is FAIIndex.load(path)
+    assert "SEQ2" in index and "SEQ4" not in index
+    assert index["SEQ2"].byte_offset == 32
+    assert index["SEQ2"].line_width == 5
+    with pytest.raises(KeyError):
+        index["SEQ4"]
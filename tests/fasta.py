@@ -1,8 +1,18 @@
 import pathlib
-from io import StringIO
+import tempfile
+from io import StringIO, BytesIO
 
-from biofiles.fasta import FASTAReader, FASTAWriter
+import pytest
+
+from biofiles.fasta import (
+    FASTAReader,
+    FASTAWriter,
+    IndexedFASTAReader,
+    ParallelFASTAReader,
+)
+from biofiles.twobit import pack_sequence
 from biofiles.types.sequence import Sequence
+from biofiles.utility.blocks import iter_fasta_records
 
 
 def test_read_single_sequence_from_string() -> None:
@@ -60,6 +70,33 @@ def test_read_no_description() -> None:
     assert sequences == [Sequence(id="SEQ", description="", sequence="ATGC")]
 
 
+@pytest.mark.parametrize("block_size", [1, 2, 3, 5, 1 << 20])
+def test_read_fasta_records_across_blocks(block_size: int) -> None:
+    data = b">SEQ1 Goose\nGAG\nAGA\n>SEQ2\r\nAT\r\nAT\r\n>SEQ3\n"
+    records = [*iter_fasta_records(BytesIO(data), block_size=block_size)]
+    assert records == [(b"SEQ1 Goose", b"GAGAGA"), (b"SEQ2", b"ATAT"), (b"SEQ3", b"")]
+
+
+def test_read_from_binary_file() -> None:
+    with FASTAReader(BytesIO(b"\n>SEQ\nATGC\n")) as r:
+        sequences = [*r]
+    assert sequences == [Sequence(id="SEQ", description="", sequence="ATGC")]
+
+    with pytest.raises(ValueError):
+        [*FASTAReader(BytesIO(b"ATGC\n>SEQ\nATGC\n"))]
+
+
+def test_read_from_temporary_file() -> None:
+    with tempfile.NamedTemporaryFile("w+") as f:
+        f.write(">SEQ\nACGT\nAC\n")
+        f.seek(0)
+        sequences = [*FASTAReader(f)]
+        f.seek(0)
+        windows = [*FASTAReader(f).iter_windows(size=3, step=3)]
+    assert sequences == [Sequence(id="SEQ", description="", sequence="ACGTAC")]
+    assert windows == [("SEQ", 0, "ACG"), ("SEQ", 3, "TAC")]
+
+
 def test_write_short_single_sequence() -> None:
     io = StringIO()
     w = FASTAWriter(io)
@@ -84,3 +121,149 @@ def test_write_multiple_sequences() -> None:
         io.getvalue()
         == ">SEQ1 Goose\nGAGAGA\n>SEQ2 Walker\nATAT\n>SEQ3 Moon landing\nCG\n"
     )
+
+
+def test_fetch_region_spanning_lines() -> None:
+    path = pathlib.Path(__file__).parent / "files" / "single_sequence.fasta"
+    with IndexedFASTAReader(path) as r:
+        assert r.fetch("SEQ", 78, 83) == "ATATA"
+        assert r.fetch("SEQ", 795, 800) == "TATAT"
+        assert r.fetch("SEQ", 10, 10) == ""
+
+
+def test_fetch_region_from_multiple_sequences() -> None:
+    path = pathlib.Path(__file__).parent / "files" / "multiple_sequences.fasta"
+    with IndexedFASTAReader(path) as r:
+        assert r.fetch("SEQ1", 1, 4) == "AGA"
+        assert r.fetch("SEQ2", 0, 4) == "ATAT"
+        assert r.fetch("SEQ3", 1, 2) == "G"
+        with pytest.raises(ValueError):
+            r.fetch("SEQ3", 1, 3)
+
+
+@pytest.mark.parametrize("memory_map", [False, True])
+def test_sequence_views(memory_map: bool) -> None:
+    path = pathlib.Path(__file__).parent / "files" / "multiple_sequences.fasta"
+    with IndexedFASTAReader(path, memory_map=memory_map) as r:
+        views = [*r]
+        assert [len(v) for v in views] == [6, 4, 2]
+        assert views[0][1:-1] == "AGAG"
+        assert views[1][-1] == "T"
+        for key in [
+            slice(None, None, -1),
+            slice(4, 1, -1),
+            slice(None, None, 2),
+            slice(1, None, -2),
+            slice(5, 0, -3),
+            slice(1, 100, 4),
+            slice(3, 3),
+            slice(2, 4, -1),
+        ]:
+            assert views[0][key] == "GAGAGA"[key]
+        assert [v.to_sequence() for v in views] == [
+            Sequence(id="SEQ1", description="Goose", sequence="GAGAGA"),
+            Sequence(id="SEQ2", description="Walker", sequence="ATAT"),
+            Sequence(id="SEQ3", description="Moon landing", sequence="CG"),
+        ]
+
+
+def test_iter_windows() -> None:
+    with FASTAReader(StringIO(">SEQ1\nACGTA\nCG\n>SEQ2\nTT\n")) as r:
+        windows = [*r.iter_windows(3, step=2)]
+    assert windows == [
+        ("SEQ1", 0, "ACG"),
+        ("SEQ1", 2, "GTA"),
+        ("SEQ1", 4, "ACG"),
+        ("SEQ1", 6, "G"),
+        ("SEQ2", 0, "TT"),
+    ]
+
+
+def test_iter_windows_with_gaps() -> None:
+    with FASTAReader(StringIO(">SEQ\nACG\nTAC\nGTA\n")) as r:
+        windows = [*r.iter_windows(2, step=4, partial=False)]
+    assert windows == [("SEQ", 0, "AC"), ("SEQ", 4, "AC")]
+
+
+@pytest.mark.parametrize("line_width", [1, 2, 3, 7])
+@pytest.mark.parametrize("size,step", [(2, 5), (1, 4), (3, 11), (4, 3)])
+def test_iter_windows_wrapped(line_width: int, size: int, step: int) -> None:
+    sequence = "ACGTTGCAAGGCCTTA"
+    lines = [sequence[i : i + line_width] for i in range(0, 16, line_width)]
+    with FASTAReader(StringIO(">S\n" + "\n".join(lines) + "\n")) as r:
+        windows = [*r.iter_windows(size, step=step)]
+    assert windows == [
+        ("S", start_c, sequence[start_c : start_c + size])
+        for start_c in range(0, len(sequence), step)
+    ]
+
+
+def test_iter_windows_crlf_from_path(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "crlf.fasta"
+    path.write_bytes(b">S1\r\nACG\r\nTAC\r\n>S2\r\nGG\r\n")
+    with FASTAReader(path) as r:
+        windows = [*r.iter_windows(3, step=2)]
+    assert windows == [
+        ("S1", 0, "ACG"),
+        ("S1", 2, "GTA"),
+        ("S1", 4, "AC"),
+        ("S2", 0, "GG"),
+    ]
+
+
+def test_iter_windows_unwrapped() -> None:
+    sequence = "ACGTTGCA" * 25_000
+    with FASTAReader(StringIO(f">SEQ\n{sequence}\n")) as r:
+        windows = [*r.iter_windows(100, step=30)]
+    assert windows == [
+        ("SEQ", start_c, sequence[start_c : start_c + 100])
+        for start_c in range(0, len(sequence), 30)
+    ]
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+def test_read_in_parallel(tmp_path: pathlib.Path, ordered: bool) -> None:
+    path = tmp_path / "sequences.fasta"
+    expected = [
+        Sequence(id=f"SEQ{i}", description=f"Sequence #{i}", sequence="ACGT" * i)
+        for i in range(1, 50)
+    ]
+    with FASTAWriter(path, width=7) as w:
+        for sequence in expected:
+            w.write(sequence)
+
+    with ParallelFASTAReader(path, processes=2, chunk_size=50, ordered=ordered) as r:
+        sequences = [*r]
+
+    if ordered:
+        assert sequences == expected
+    else:
+        assert sorted(sequences, key=lambda s: len(s.sequence)) == expected
+
+
+def test_read_in_parallel_from_stream() -> None:
+    with ParallelFASTAReader(BytesIO(b">SEQ\nATGC\n")) as r:
+        sequences = [*r]
+    assert sequences == [Sequence(id="SEQ", description="", sequence="ATGC")]
+
+
+def test_write_many_to_binary_file() -> None:
+    io = BytesIO()
+    w = FASTAWriter(io, width=4)
+    w.write_many(
+        [
+            Sequence(id="SEQ1", description="Goose", sequence="GAGAGA"),
+            pack_sequence(Sequence(id="SEQ2", description="Walker", sequence="ATNt")),
+            Sequence(id="SEQ3", description="Empty", sequence=""),
+        ]
+    )
+    assert io.getvalue() == b">SEQ1 Goose\nGAGA\nGA\n>SEQ2 Walker\nATNt\n>SEQ3 Empty\n"
+
+
+def test_write_to_temporary_file() -> None:
+    with tempfile.NamedTemporaryFile("w+") as f:
+        FASTAWriter(f, width=4).write(
+            Sequence(id="SEQ1", description="Goose", sequence="GAGAGA")
+        )
+        f.seek(0)
+        assert f.read() == ">SEQ1 Goose\nGAGA\nGA\n"
@@ -0,0 +1,77 @@
+import pathlib
+import tempfile
+from io import StringIO, BytesIO
+
+import pytest
+
+from biofiles.fastq import FASTQReader
+from biofiles.types.sequence import SequencingRead
+from biofiles.utility.blocks import iter_fastq_records
+
+
+EXPECTED_READS = [
+    SequencingRead(
+        id="READ1",
+        description="1:N:0:ATCACG",
+        sequence="GATTTGGGG",
+        quality="!''*((((*",
+    ),
+    SequencingRead(id="READ2", description="", sequence="ACGT", quality="IIII"),
+]
+
+
+def test_read_fastq_from_path() -> None:
+    path = pathlib.Path(__file__).parent / "files" / "reads.fastq"
+    with FASTQReader(path) as r:
+        reads = [*r]
+    assert reads == EXPECTED_READS
+
+
+def test_read_fastq_from_text_file() -> None:
+    path = pathlib.Path(__file__).parent / "files" / "reads.fastq"
+    with open(path) as f, FASTQReader(f) as r:
+        reads = [*r]
+    assert reads == EXPECTED_READS
+
+
+def test_read_fastq_from_temporary_file() -> None:
+    with tempfile.NamedTemporaryFile("w+") as f:
+        f.write("@READ2\nACGT\n+\nIIII\n")
+        f.seek(0)
+        reads = [*FASTQReader(f)]
+    assert reads == EXPECTED_READS[1:]
+
+
+def test_read_fastq_records_across_blocks() -> None:
+    data = b"@R1\nAC\n+\nII\n@R2\nGT\n+\nJJ"
+    records = [*iter_fastq_records(BytesIO(data), block_size=3)]
+    assert records == [(b"R1", b"AC", b"II"), (b"R2", b"GT", b"JJ")]
+
+
+def test_read_truncated_fastq() -> None:
+    with pytest.raises(ValueError):
+        [*FASTQReader(StringIO("@R1\nACGT\n+\n"))]
+    with pytest.raises(ValueError):
+        [*FASTQReader(BytesIO(b"@R1\nACGT\n+\n"))]
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b"@R1 d\r\nACGT\r\n+\r\nIIII\r\n@R2\r\nAC\r\n+\r\nII\r\n",
+        b"\n@R1 d\nACGT\n+\nIIII\n\n\n@R2\nAC\n+\nII\n\n",
+        b"@R1 d\r\nACGT\r\n+\r\nIIII\r\n\r\n@R2\r\nAC\r\n+\r\nII",
+        b"@R0\n\n+\n\n\n@R1 d\nACGT\n+\nIIII\n@R2\nAC\n+\nII\n",
+    ],
+)
+def test_read_fastq_line_breaks(data: bytes) -> None:
+    # Text streams don't translate line breaks with newline="".
+    text_reads = [*FASTQReader(StringIO(data.decode(), newline=""))]
+    assert [*FASTQReader(BytesIO(data))] == text_reads
+    assert text_reads[-2:] == [
+        SequencingRead(id="R1", description="d", sequence="ACGT", quality="IIII"),
+        SequencingRead(id="R2", description="", sequence="AC", quality="II"),
+    ]
+    for block_size in [1, 5]:
+        records = [*iter_fastq_records(BytesIO(data), block_size=block_size)]
+        assert records == [*iter_fastq_records(BytesIO(data))]
@@ -0,0 +1,68 @@
+import pathlib
+
+from biofiles.bam import BAMReader, BAMWriter
+from biofiles.dialects.refseq import REFSEQ_DIALECT
+from biofiles.gtf import GTFReader
+from biofiles.types.alignment import (
+    BAMFlag,
+    BAMTag,
+    ReferenceSequence,
+    SpliceJunction,
+)
+from biofiles.utility.junctions import JunctionCounter, known_junctions
+from tests.common import make_alignment
+
+CHR1 = ReferenceSequence(id="NC_000001.11", length=100_000)
+
+
+XS_PLUS = (BAMTag(tag="XS", value="+"),)
+
+
+ALIGNMENTS = [
+    make_alignment(CHR1, 65423, "10M86N10M", tags=XS_PLUS),
+    make_alignment(CHR1, 65428, "2S5M86N10M3433N5M", tags=XS_PLUS),
+    make_alignment(CHR1, 65428, "5M86N10M", flags=BAMFlag.DUPLICATE, tags=XS_PLUS),
+    make_alignment(CHR1, 65420, "5M2D6M86N10M"),
+    make_alignment(CHR1, 100, "10M"),
+]
+
+
+def test_count_junctions() -> None:
+    counter = JunctionCounter()
+    counter.update(ALIGNMENTS)
+    assert len(counter) == 3
+    assert counter["NC_000001.11", 65433, 65519, "+"] == 2
+    assert counter["NC_000001.11", 65433, 65519, None] == 1
+    assert counter["NC_000001.11", 65529, 68962, "+"] == 1
+    assert counter["NC_000001.11", 65433, 65519, "-"] == 0
+
+
+def test_annotate_junctions() -> None:
+    path = pathlib.Path(__file__).parent / "files" / "refseq_annotation.gtf"
+    with GTFReader(path, REFSEQ_DIALECT) as r:
+        known = known_junctions(r)
+    assert known == {
+        ("NC_000001.11", 65433, 65519, "+"),
+        ("NC_000001.11", 65573, 69036, "+"),
+    }
+
+    counter = JunctionCounter()
+    counter.update(ALIGNMENTS)
+    assert [*counter.iter_junctions(known)] == [
+        SpliceJunction(CHR1, 65433, 65519, None, read_count=1, known=True),
+        SpliceJunction(CHR1, 65433, 65519, "+", read_count=2, known=True),
+        SpliceJunction(CHR1, 65529, 68962, "+", read_count=1, known=False),
+    ]
+    assert [j.known for j in counter.iter_junctions()] == [None, None, None]
+
+
+def test_count_junctions_from_bam(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "spliced.bam"
+    with BAMWriter(path, [CHR1]) as w:
+        for alignment in ALIGNMENTS:
+            w.write(alignment)
+    counter = JunctionCounter()
+    with BAMReader(path, lazy=True) as r:
+        counter.update(r)
+    assert counter["NC_000001.11", 65433, 65519, "+"] == 2
+    assert counter["NC_000001.11", 65529, 68962, "+"] == 1
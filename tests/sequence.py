@@ -0,0 +1,29 @@
+from biofiles.types.sequence import Sequence
+from biofiles.utility.sequence import (
+    composition,
+    gc_content,
+    reverse_complement,
+    translate,
+)
+
+
+def test_reverse_complement() -> None:
+    assert reverse_complement("ACGTNRacgt") == "acgtYNACGT"
+    assert reverse_complement(b"AACG") == b"CGTT"
+    assert reverse_complement(
+        Sequence(id="SEQ", description="Goose", sequence="GAGAGA")
+    ) == Sequence(id="SEQ", description="Goose", sequence="TCTCTC")
+
+
+def test_translate() -> None:
+    assert translate("ATGGCCtgaTT") == "MA*"
+    assert translate(b"ATGNNNAUG") == b"MXM"
+    assert translate(
+        Sequence(id="SEQ", description="", sequence="TTTTAA")
+    ) == Sequence(id="SEQ", description="", sequence="F*")
+
+
+def test_composition() -> None:
+    assert composition("AACGTNa") == {"A": 2, "C": 1, "G": 1, "T": 1, "N": 1, "a": 1}
+    assert gc_content(b"GGCCAATTNN") == 0.5
+    assert gc_content("") == 0.0
@@ -0,0 +1,57 @@
+import pathlib
+import random
+
+import pytest
+
+from biofiles.bam import BAMReader, BAMWriter
+from biofiles.types.alignment import Alignment, ReferenceSequence
+from biofiles.utility.sort import sort_bam
+from tests.common import make_alignment
+
+
+def _write_unsorted_bam(path: pathlib.Path, num_alignments: int) -> None:
+    rng = random.Random(0)
+    references = [
+        ReferenceSequence(id="chr1", length=10_000),
+        ReferenceSequence(id="chr2", length=10_000),
+    ]
+    with BAMWriter(path, references, "@HD\tVN:1.6\tSO:queryname\n@CO\tunsorted\n") as w:
+        for i in range(num_alignments):
+            reference = rng.choice([*references, None])
+            w.write(
+                make_alignment(
+                    reference,
+                    rng.randrange(100) if reference else -1,
+                    "4M" if reference else "",
+                    flags=0 if reference else 4,
+                    read_name=f"read{i}",
+                )
+            )
+
+
+@pytest.mark.parametrize(
+    "memory_limit,max_runs_per_merge", [(1 << 20, 64), (5000, 64), (5000, 2), (5000, 3)]
+)
+def test_sort_bam(
+    tmp_path: pathlib.Path, memory_limit: int, max_runs_per_merge: int
+) -> None:
+    _write_unsorted_bam(tmp_path / "unsorted.bam", 300)
+    sort_bam(
+        tmp_path / "unsorted.bam",
+        tmp_path / "sorted.bam",
+        memory_limit=memory_limit,
+        threads=2,
+        max_runs_per_merge=max_runs_per_merge,
+    )
+
+    with BAMReader(tmp_path / "unsorted.bam") as r:
+        alignments = [*r]
+    with BAMReader(tmp_path / "sorted.bam") as r:
+        assert r.header_text == "@HD\tVN:1.6\tSO:coordinate\n@CO\tunsorted\n"
+        sorted_alignments = [*r]
+
+    def key(alignment: Alignment) -> tuple[int, int]:
+        reference = alignment.reference_sequence
+        return (int(reference.id[3:]) if reference else 3), alignment.start_c
+
+    assert sorted_alignments == sorted(alignments, key=key)
@@ -0,0 +1,43 @@
+import pathlib
+
+from biofiles.twobit import (
+    TwoBitReader,
+    TwoBitWriter,
+    pack_sequence,
+    unpack_sequence,
+)
+from biofiles.types.sequence import Sequence
+
+
+SEQUENCES = [
+    Sequence(id="chr1", description="", sequence="ACGTNNNNacgtnnACGTAcgTTTG"),
+    Sequence(id="chr2", description="", sequence="NNNNNGGGCCCAAATTTnnnnttt"),
+    Sequence(id="chrM", description="", sequence=""),
+]
+
+
+def test_pack_and_unpack() -> None:
+    for sequence in SEQUENCES:
+        packed = pack_sequence(sequence)
+        assert len(packed.packed) == (len(sequence.sequence) + 3) // 4
+        assert unpack_sequence(packed) == sequence
+
+
+def test_pack_ambiguous_bases() -> None:
+    packed = pack_sequence(Sequence(id="SEQ", description="", sequence="ARYt"))
+    assert packed.n_blocks == ((1, 3),)
+    assert unpack_sequence(packed).sequence == "ANNt"
+
+
+def test_write_and_read_two_bit(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "genome.2bit"
+    with TwoBitWriter(path) as w:
+        for sequence in SEQUENCES:
+            w.write(sequence)
+
+    with TwoBitReader(path) as r:
+        assert [unpack_sequence(s) for s in r] == SEQUENCES
+        chr1 = SEQUENCES[0].sequence
+        for start_c in range(len(chr1) + 1):
+            for end_c in range(start_c, len(chr1) + 1):
+                assert r.fetch("chr1", start_c, end_c) == chr1[start_c:end_c]